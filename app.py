@@ -1,9 +1,17 @@
 import streamlit as st
 import os
-from pdf_processor import extract_text_from_pdf
-from mcq_generator import generate_mcqs
+from datetime import datetime, time, timedelta
+from pdf_processor import iter_pdf_pages, pdf_content_hash, clean_extracted_text, min_text_length_for_questions, PAGE_BREAK
+from mcq_generator import stream_mcqs, schedule_pool_refill
 from quiz_manager import QuizManager
-from database import db_manager
+from text_index import DocumentIndex
+from database import db_manager, QUESTION_PAGE_SIZE
+
+# Upper limit for the number of questions in a single quiz
+MAX_QUESTIONS = 20
+
+# Quiz sessions shown per page of history
+HISTORY_PAGE_SIZE = 20
 
 # Set page config must be the first Streamlit command
 st.set_page_config(
@@ -29,6 +37,20 @@ def main():
         st.session_state.current_page = "quiz"
     if 'pdf_filename' not in st.session_state:
         st.session_state.pdf_filename = ""
+    if 'pdf_hash' not in st.session_state:
+        st.session_state.pdf_hash = None
+    if 'pdf_pages' not in st.session_state:
+        st.session_state.pdf_pages = []
+    if 'pdf_page_iter' not in st.session_state:
+        st.session_state.pdf_page_iter = None
+    if 'doc_index' not in st.session_state:
+        st.session_state.doc_index = None
+    if 'question_stream' not in st.session_state:
+        st.session_state.question_stream = None
+    
+    # A reloaded page starts a new session; resume its unfinished quiz from the database
+    if st.session_state.quiz_manager is None and 'quiz' in st.query_params:
+        resume_quiz(st.query_params['quiz'])
     
     # Sidebar navigation
     st.sidebar.title("Navigation")
@@ -65,25 +87,31 @@ def setup_phase():
     
     if uploaded_file is not None:
         if not st.session_state.pdf_processed:
-            with st.spinner("Extracting text from PDF..."):
-                try:
-                    pdf_text = extract_text_from_pdf(uploaded_file)
-                    if not pdf_text.strip():
-                        st.error("❌ Could not extract text from the PDF. Please ensure the PDF contains readable text.")
-                        return
-                    
-                    st.session_state.pdf_text = pdf_text
-                    st.session_state.pdf_processed = True
-                    st.session_state.pdf_filename = uploaded_file.name
-                    st.success("✅ PDF text extracted successfully!")
-                    
-                    # Show text preview
-                    with st.expander("📄 Preview extracted text (first 500 characters)"):
-                        st.text(pdf_text[:500] + "..." if len(pdf_text) > 500 else pdf_text)
-                        
-                except Exception as e:
-                    st.error(f"❌ Error processing PDF: {str(e)}")
-                    return
+            st.session_state.pdf_page_iter = iter_pdf_pages(uploaded_file)
+            st.session_state.pdf_pages = []
+            st.session_state.pdf_text = ""
+            st.session_state.pdf_filename = uploaded_file.name
+            # Pools and chunk coverage are keyed on the file, not on the text extracted so far
+            st.session_state.pdf_hash = pdf_content_hash(uploaded_file)
+            
+            # Only buffer enough pages for the largest quiz; the rest is extracted below
+            try:
+                extract_pdf_pages(min_text_length_for_questions(MAX_QUESTIONS))
+            except Exception as e:
+                st.error(f"❌ Error processing PDF: {str(e)}")
+                return
+            
+            if not st.session_state.pdf_text.strip():
+                st.error("❌ Could not extract text from the PDF. Please ensure the PDF contains readable text.")
+                return
+            
+            st.session_state.pdf_processed = True
+            st.success("✅ PDF text extracted successfully!")
+            
+            # Show text preview
+            pdf_text = st.session_state.pdf_text
+            with st.expander("📄 Preview extracted text (first 500 characters)"):
+                st.text(pdf_text[:500] + "..." if len(pdf_text) > 500 else pdf_text)
         
         if st.session_state.pdf_processed:
             # Configuration Section
@@ -103,9 +131,9 @@ def setup_phase():
                 num_questions = st.number_input(
                     "Number of Questions",
                     min_value=1,
-                    max_value=20,
+                    max_value=MAX_QUESTIONS,
                     value=5,
-                    help="Choose how many MCQ questions you want to generate (1-20)"
+                    help=f"Choose how many MCQ questions you want to generate (1-{MAX_QUESTIONS})"
                 )
             
             # Generate Quiz Button
@@ -117,34 +145,180 @@ def setup_phase():
                 
                 with st.spinner(f"Generating {num_questions} {difficulty.lower()} level questions from your PDF..."):
                     try:
-                        questions = generate_mcqs(
+                        # Start the quiz on the first question; the rest keep generating while it is answered
+                        st.session_state.question_stream = stream_mcqs(
                             st.session_state.pdf_text, 
                             difficulty, 
                             num_questions, 
                             pdf_filename=st.session_state.pdf_filename,
-                            avoid_used_questions=True
+                            avoid_used_questions=True,
+                            document_key=st.session_state.pdf_hash,
+                            # Until extraction finishes, extract_pdf_pages fills the pools from the whole text
+                            refill_pool=st.session_state.pdf_page_iter is None
                         )
+                        st.session_state.quiz_manager = QuizManager([], expected_count=num_questions, loading=True)
+                        pull_questions(1)
                         
-                        if not questions:
+                        if not st.session_state.quiz_manager.questions:
+                            st.session_state.quiz_manager = None
                             st.error("❌ Failed to generate questions. Please try again or upload a different PDF.")
                             return
                         
-                        # Initialize quiz manager
-                        st.session_state.quiz_manager = QuizManager(questions)
                         st.session_state.quiz_started = True
+                        offload_quiz()
                         st.rerun()
-                        
+                    
                     except Exception as e:
+                        st.session_state.question_stream = None
+                        st.session_state.quiz_manager = None
                         st.error(f"❌ Error generating questions: {str(e)}")
+            
+            # Keep extracting the remaining pages while the quiz is being configured
+            extract_remaining_pages()
+
+def extract_remaining_pages():
+    """Finish an in-progress PDF extraction, warning instead of failing if it breaks"""
+    if st.session_state.pdf_page_iter is None:
+        return
+    
+    try:
+        extract_pdf_pages()
+    except Exception as e:
+        st.warning(f"Could not extract the rest of the PDF: {str(e)}")
+        st.session_state.pdf_page_iter = None
+
+def extract_pdf_pages(min_length=None):
+    """
+    Pull pages from the in-progress PDF extraction with a live progress bar
+    
+    Args:
+        min_length (int): Stop once this many characters are buffered, None to finish the document
+    """
+    page_iter = st.session_state.pdf_page_iter
+    if page_iter is None:
+        return
+    
+    progress_bar = st.progress(0.0, text="Extracting text from PDF...")
+    buffered_length = len(st.session_state.pdf_text)
+    
+    for page_num, page_count, page_text in page_iter:
+        # Pages without text are kept so hints show the right page number
+        st.session_state.pdf_pages.append(page_text)
+        buffered_length += len(page_text) + 1
+        progress_bar.progress(page_num / page_count, text=f"Extracting text from PDF... page {page_num} of {page_count}")
+        
+        if min_length is not None and buffered_length >= min_length:
+            break
+    else:
+        st.session_state.pdf_page_iter = None
+    
+    st.session_state.pdf_text = clean_extracted_text(PAGE_BREAK.join(st.session_state.pdf_pages))
+    st.session_state.doc_index = DocumentIndex(st.session_state.pdf_text)
+    progress_bar.empty()
+    
+    # Pre-generate questions for every difficulty once the whole document is known
+    if st.session_state.pdf_page_iter is None:
+        try:
+            schedule_pool_refill(
+                st.session_state.pdf_text,
+                pdf_filename=st.session_state.pdf_filename,
+                document_key=st.session_state.pdf_hash
+            )
+        except Exception as e:
+            print(f"Could not start question pre-generation: {str(e)}")
+
+def pull_questions(count=None, status=None):
+    """
+    Move generated questions from the in-progress stream into the quiz
+    
+    Args:
+        count (int): Stop once the quiz holds this many questions, None to finish the stream
+        status: Placeholder updated after each question, if any
+    """
+    question_stream = st.session_state.question_stream
+    quiz_manager = st.session_state.quiz_manager
+    if question_stream is None or quiz_manager is None:
+        return
+    
+    try:
+        while count is None or len(quiz_manager.questions) < count:
+            quiz_manager.add_question(next(question_stream))
+            if status is not None:
+                status.caption(f"⏳ {len(quiz_manager.questions)} of {quiz_manager.expected_count} questions ready...")
+        return
+    except StopIteration:
+        pass
+    except Exception as e:
+        if not quiz_manager.questions:
+            st.session_state.question_stream = None
+            raise
+        st.warning(f"Could not generate the remaining questions: {str(e)}")
+    
+    # The stream is exhausted: the quiz has every question it is going to get
+    st.session_state.question_stream = None
+    if quiz_manager.questions and len(quiz_manager.questions) < quiz_manager.expected_count:
+        st.warning(f"Only {len(quiz_manager.questions)} out of {quiz_manager.expected_count} questions could be generated from the PDF content.")
+    quiz_manager.finish_loading()
+
+def offload_quiz():
+    """Store the running quiz in the database and name it in the URL, so a reloaded page can resume it"""
+    quiz_manager = st.session_state.quiz_manager
+    saved = db_manager.save_quiz_state(
+        quiz_manager.attempt_id,
+        quiz_manager.serialize(),
+        pdf_filename=st.session_state.pdf_filename,
+        difficulty=st.session_state.get('quiz_difficulty')
+    )
+    if saved:
+        st.query_params['quiz'] = quiz_manager.attempt_id
+
+def resume_quiz(attempt_id):
+    """
+    Restore an offloaded quiz into a new session
+    
+    Args:
+        attempt_id (str): Attempt named in the URL
+    """
+    saved = db_manager.load_quiz_state(attempt_id)
+    try:
+        quiz_manager = QuizManager.restore(saved['state']) if saved else None
+    except Exception as e:
+        print(f"Could not restore quiz {attempt_id}: {str(e)}")
+        quiz_manager = None
+    if quiz_manager is None:
+        del st.query_params['quiz']
+        return
+    
+    # The question stream did not survive the reload; the quiz keeps the questions it had
+    if quiz_manager.loading:
+        quiz_manager.finish_loading()
+    st.session_state.quiz_manager = quiz_manager
+    st.session_state.pdf_filename = saved['pdf_filename'] or ""
+    st.session_state.quiz_difficulty = saved['difficulty'] or 'Medium'
+    st.session_state.quiz_started = True
+
+def discard_offloaded_quiz(quiz_manager):
+    """Drop the stored state of a finished or abandoned quiz"""
+    db_manager.delete_quiz_state(quiz_manager.attempt_id)
+    if 'quiz' in st.query_params:
+        del st.query_params['quiz']
 
 def quiz_phase():
     """Handle the quiz taking phase"""
     quiz_manager = st.session_state.quiz_manager
     
+    # Wait for the next question when answering has caught up with generation
+    if quiz_manager.loading and quiz_manager.current_question_index >= len(quiz_manager.questions):
+        with st.spinner("Generating the next question..."):
+            pull_questions(quiz_manager.current_question_index + 1)
+    
     if quiz_manager.is_completed():
         show_results()
     else:
         show_current_question()
+    
+    # A quiz started early keeps extracting the rest of the PDF, so hints cover all of it
+    extract_remaining_pages()
 
 def show_current_question():
     """Display the current question and handle answer submission"""
@@ -152,19 +326,19 @@ def show_current_question():
     current_question = quiz_manager.get_current_question()
     
     # Progress indicator
-    progress = (quiz_manager.current_question_index) / len(quiz_manager.questions)
-    st.progress(progress)
+    progress = quiz_manager.get_progress()
+    st.progress(progress['progress_percentage'] / 100)
     
-    st.header(f"Question {quiz_manager.current_question_index + 1} of {len(quiz_manager.questions)}")
+    st.header(f"Question {progress['current_question']} of {progress['total_questions']}")
     
     # Question text
-    st.subheader(current_question['question'])
+    st.subheader(current_question.question)
     
     # Answer options
     answer_key = f"answer_{quiz_manager.current_question_index}"
     selected_answer = st.radio(
         "Select your answer:",
-        current_question['options'],
+        current_question.options,
         key=answer_key,
         index=None
     )
@@ -175,33 +349,46 @@ def show_current_question():
     with col1:
         if st.button("⏮️ Start Over", help="Restart the entire quiz"):
             # Reset everything
+            discard_offloaded_quiz(quiz_manager)
             st.session_state.quiz_started = False
             st.session_state.pdf_processed = False
             st.session_state.quiz_manager = None
+            st.session_state.question_stream = None
             st.session_state.pdf_text = ""
+            st.session_state.pdf_pages = []
+            st.session_state.pdf_page_iter = None
+            st.session_state.doc_index = None
             st.rerun()
     
     with col3:
         if st.button("➡️ Next Question", type="primary", disabled=selected_answer is None):
             if selected_answer is not None:
                 quiz_manager.submit_answer(selected_answer)
+                offload_quiz()
                 st.rerun()
     
     # Show question source hint
     with st.expander("💡 Need help? View relevant text from your PDF"):
-        # Find relevant text snippet (simple keyword matching)
-        question_words = current_question['question'].lower().split()
-        pdf_sentences = st.session_state.pdf_text.split('.')
+        # Find relevant text snippet from the document index
+        doc_index = st.session_state.doc_index
+        if doc_index is None:
+            doc_index = st.session_state.doc_index = DocumentIndex(st.session_state.pdf_text)
         
-        relevant_sentences = []
-        for sentence in pdf_sentences:
-            if any(word in sentence.lower() for word in question_words if len(word) > 3):
-                relevant_sentences.append(sentence.strip())
+        sentence_ids = doc_index.rank_sentences(current_question.question, limit=3)
+        relevant_sentences = [
+            f"[p. {doc_index.get_page(i)}] {doc_index.get_sentence(i)}" for i in sentence_ids
+        ]
         
         if relevant_sentences:
-            st.text("\n".join(relevant_sentences[:3]))  # Show up to 3 relevant sentences
+            st.text("\n".join(relevant_sentences))  # Show up to 3 relevant sentences
         else:
             st.text("Review your uploaded PDF content for context.")
+    
+    # Keep generating the remaining questions while this one is being answered
+    if quiz_manager.loading:
+        status = st.empty()
+        pull_questions(status=status)
+        status.empty()
 
 def show_results():
     """Display final quiz results"""
@@ -209,23 +396,30 @@ def show_results():
     score, total = quiz_manager.get_score()
     percentage = (score / total) * 100
     
-    # Save quiz results to database
-    try:
-        session_id = db_manager.save_quiz_session(
-            st.session_state.pdf_filename,
-            st.session_state.get('quiz_difficulty', 'Medium'),
-            quiz_manager.questions,
-            quiz_manager.user_answers
-        )
+    # Save quiz results to database once per attempt; widget reruns reuse the stored session
+    if st.session_state.get('saved_attempt_id') != quiz_manager.attempt_id:
+        try:
+            # Marking the questions as used avoids repetition in later quizzes
+            session_id = db_manager.save_quiz_session(
+                st.session_state.pdf_filename,
+                st.session_state.get('quiz_difficulty', 'Medium'),
+                quiz_manager.get_question_dicts(),
+                quiz_manager.user_answers,
+                correct_flags=quiz_manager.get_correct_flags(),
+                attempt_id=quiz_manager.attempt_id,
+                mark_used=True
+            )
+        except Exception as e:
+            session_id = None
+        
+        # A failed save is retried on the next rerun
         if session_id:
-            st.success("📊 Quiz results saved to your history!")
-            
-        # Mark questions as used to avoid repetition
-        db_manager.mark_questions_as_used(
-            st.session_state.pdf_filename,
-            quiz_manager.questions
-        )
-    except Exception as e:
+            st.session_state.saved_attempt_id = quiz_manager.attempt_id
+            discard_offloaded_quiz(quiz_manager)
+    
+    if st.session_state.get('saved_attempt_id') == quiz_manager.attempt_id:
+        st.success("📊 Quiz results saved to your history!")
+    else:
         st.warning("Could not save quiz results to database.")
     
     st.balloons()
@@ -249,12 +443,12 @@ def show_results():
     st.header("📊 Detailed Results")
     
     for i, (question_data, user_answer) in enumerate(zip(quiz_manager.questions, quiz_manager.user_answers)):
-        is_correct = user_answer == question_data['correct_answer']
+        is_correct = quiz_manager.is_answer_correct(i)
         
         with st.expander(f"Question {i+1} {'✅' if is_correct else '❌'}"):
-            st.write(f"**Question:** {question_data['question']}")
+            st.write(f"**Question:** {question_data.question}")
             st.write(f"**Your Answer:** {user_answer}")
-            st.write(f"**Correct Answer:** {question_data['correct_answer']}")
+            st.write(f"**Correct Answer:** {question_data.correct_answer}")
             
             if not is_correct:
                 st.error("Incorrect")
@@ -269,6 +463,7 @@ def show_results():
             # Generate more questions from the same PDF
             st.session_state.quiz_started = False
             st.session_state.quiz_manager = None
+            st.session_state.question_stream = None
             # Keep the same PDF loaded
             st.rerun()
     
@@ -278,18 +473,57 @@ def show_results():
             st.session_state.quiz_started = False
             st.session_state.pdf_processed = False
             st.session_state.quiz_manager = None
+            st.session_state.question_stream = None
             st.session_state.pdf_text = ""
+            st.session_state.pdf_pages = []
+            st.session_state.pdf_page_iter = None
+            st.session_state.doc_index = None
             st.session_state.pdf_filename = ""
+            st.session_state.pdf_hash = None
             st.rerun()
 
 def show_quiz_history():
     """Display quiz history from database"""
     st.header("📚 Quiz History")
     
-    history = db_manager.get_quiz_history(limit=20)
+    # Filters are applied by the database query
+    options = db_manager.get_history_filter_options()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        pdf_filter = st.selectbox("PDF", ["All PDFs"] + options['pdf_filenames'])
+    with col2:
+        difficulty_filter = st.selectbox("Difficulty", ["All"] + options['difficulties'])
+    with col3:
+        date_range = st.date_input("Completed between (UTC)", value=[])
+    
+    filters = {
+        'pdf_filename': None if pdf_filter == "All PDFs" else pdf_filter,
+        'difficulty': None if difficulty_filter == "All" else difficulty_filter,
+        'since': datetime.combine(date_range[0], time.min) if len(date_range) > 0 else None,
+        'until': datetime.combine(date_range[-1] + timedelta(days=1), time.min) if len(date_range) > 0 else None
+    }
+    
+    # Changing a filter starts again from the newest page
+    filter_key = tuple(filters.values())
+    if st.session_state.get('history_filter_key') != filter_key:
+        st.session_state.history_filter_key = filter_key
+        st.session_state.history_cursors = []
+    cursors = st.session_state.history_cursors
+    
+    # One extra row tells whether there is an older page
+    history = db_manager.get_quiz_history(
+        limit=HISTORY_PAGE_SIZE + 1,
+        before=cursors[-1] if cursors else None,
+        **filters
+    )
+    has_older = len(history) > HISTORY_PAGE_SIZE
+    history = history[:HISTORY_PAGE_SIZE]
     
     if not history:
-        st.info("No quiz history found. Take some quizzes to see your progress here!")
+        if any(value is not None for value in filters.values()) or cursors:
+            st.info("No quizzes match these filters.")
+        else:
+            st.info("No quiz history found. Take some quizzes to see your progress here!")
         return
     
     for quiz in history:
@@ -304,6 +538,40 @@ def show_quiz_history():
                 st.metric("Difficulty", quiz.difficulty)
             with col4:
                 st.metric("Date", quiz.completed_at.strftime('%m/%d/%Y'))
+            
+            # Questions are only loaded on request, one page at a time
+            if st.checkbox("Show questions", key=f"show_questions_{quiz.id}"):
+                show_quiz_questions(quiz)
+    
+    # Page navigation
+    col1, col2 = st.columns(2)
+    with col1:
+        if cursors and st.button("⬅️ Newer", use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if has_older and st.button("Older ➡️", use_container_width=True):
+            cursors.append((history[-1].completed_at, history[-1].id))
+            st.rerun()
+
+def show_quiz_questions(quiz):
+    """Display the stored questions and answers of a past quiz, one page at a time"""
+    page_count = max(1, -(-(quiz.total_questions or 0) // QUESTION_PAGE_SIZE))
+    page = 1
+    if page_count > 1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, key=f"question_page_{quiz.id}")
+    
+    offset = (page - 1) * QUESTION_PAGE_SIZE
+    details = db_manager.get_quiz_details(quiz.id, offset=offset, limit=QUESTION_PAGE_SIZE)
+    if not details or not details['questions']:
+        st.text("No questions were stored for this quiz.")
+        return
+    
+    for i, question in enumerate(details['questions'], start=offset + 1):
+        st.write(f"**{i}. {question['question_text']}** {'✅' if question['is_correct'] else '❌'}")
+        st.write(f"Your Answer: {question['user_answer']}")
+        if not question['is_correct']:
+            st.write(f"Correct Answer: {question['correct_answer']}")
 
 def show_performance_stats():
     """Display overall performance statistics"""
@@ -0,0 +1,296 @@
+"""
+Pre-build quizzes for a whole folder of PDFs without the Streamlit app
+
+Text is extracted in worker processes while questions for the PDFs already
+extracted are generated by concurrent async workers. With --output db the
+questions go into the question pool the app serves quizzes from; with a
+.jsonl path one line per PDF and difficulty is appended. Finished jobs are
+recorded in the checkpoint file, so an interrupted run resumes where it
+stopped.
+
+Usage:
+    python batch_generate.py COURSE_DIR [--difficulty Easy Medium Hard] [--questions N] [--output db|FILE.jsonl]
+    python batch_generate.py --manifest pdfs.txt [...]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from pdf_processor import extract_text_from_pdf, pdf_content_hash, PDF_EXTRACTION_WORKERS
+from mcq_generator import generate_mcqs, question_cache_key, DIFFICULTIES, MCQ_MAX_CONCURRENCY
+from llm_backends import get_backend
+
+DEFAULT_CHECKPOINT = "batch_checkpoint.jsonl"
+
+def collect_pdf_paths(directory=None, manifest=None):
+    """
+    List the PDFs to process
+    
+    Args:
+        directory (str): Folder searched recursively for .pdf files
+        manifest (str): Text file with one PDF path per line, relative to the manifest; # starts a comment
+    
+    Returns:
+        list: Absolute PDF paths in a stable order
+    """
+    paths = []
+    if directory:
+        for root, _, filenames in os.walk(directory):
+            paths.extend(
+                os.path.join(root, filename) for filename in filenames
+                if filename.lower().endswith('.pdf')
+            )
+    
+    if manifest:
+        base_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, encoding='utf-8') as manifest_file:
+            for line in manifest_file:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    paths.append(os.path.join(base_dir, line))
+    
+    return sorted(set(os.path.abspath(path) for path in paths))
+
+def job_key(path, difficulty, num_questions):
+    """
+    Build the checkpoint key of one PDF and difficulty
+    
+    The file size and modification time are part of the key so an edited
+    PDF is processed again.
+    
+    Args:
+        path (str): Absolute PDF path
+        difficulty (str): Difficulty level
+        num_questions (int): Questions per quiz
+    
+    Returns:
+        str: Checkpoint key
+    """
+    stat = os.stat(path)
+    return f"{path}|{stat.st_size}|{stat.st_mtime_ns}|{difficulty}|{num_questions}"
+
+def load_checkpoint(checkpoint_path):
+    """
+    Read the keys of jobs finished by earlier runs
+    
+    Args:
+        checkpoint_path (str): Checkpoint file
+    
+    Returns:
+        set: Finished job keys
+    """
+    if not os.path.exists(checkpoint_path):
+        return set()
+    
+    finished = set()
+    with open(checkpoint_path, encoding='utf-8') as checkpoint_file:
+        for line in checkpoint_file:
+            try:
+                finished.add(json.loads(line)['key'])
+            except (ValueError, KeyError):
+                # A line cut off by an interrupted run
+                continue
+    return finished
+
+def extract_pdf_file(path):
+    """
+    Extract the text of one PDF in a worker process
+    
+    Args:
+        path (str): PDF path
+    
+    Returns:
+        dict: path, text, content_hash, seconds and error (None on success)
+    """
+    start = time.perf_counter()
+    try:
+        with open(path, 'rb') as pdf_file:
+            pdf_bytes = pdf_file.read()
+        # Pages are already spread across processes one PDF at a time
+        text = extract_text_from_pdf(pdf_bytes, workers=1)
+        return {
+            'path': path, 'text': text, 'content_hash': pdf_content_hash(pdf_bytes),
+            'seconds': time.perf_counter() - start, 'error': None
+        }
+    except Exception as e:
+        return {'path': path, 'text': None, 'content_hash': None, 'seconds': time.perf_counter() - start, 'error': str(e)}
+
+def init_extraction_worker():
+    """Drop database connections a forked extraction worker inherited from the parent"""
+    from database import db_manager
+    db_manager.engine.dispose(close=False)
+
+async def run_batch(paths, difficulties, num_questions, output='db', checkpoint_path=DEFAULT_CHECKPOINT,
+                    extract_workers=PDF_EXTRACTION_WORKERS, concurrency=MCQ_MAX_CONCURRENCY, backend=None):
+    """
+    Extract and generate quizzes for a list of PDFs
+    
+    Args:
+        paths (list): PDF paths
+        difficulties (list): Difficulty levels to build a quiz for
+        num_questions (int): Questions per quiz
+        output (str): "db" for the question pool, otherwise a JSONL file path
+        checkpoint_path (str): File recording finished jobs
+        extract_workers (int): Processes used for text extraction
+        concurrency (int): Quizzes generated at once
+        backend (LLMBackend): Model backend, defaults to the shared LLM_PROVIDER backend
+    
+    Returns:
+        dict: Counters for the throughput summary
+    """
+    if backend is None:
+        backend = get_backend()
+    
+    finished = load_checkpoint(checkpoint_path)
+    summary = {
+        'pdfs': 0, 'pdfs_failed': 0, 'pdfs_skipped': 0, 'quizzes': 0, 'quizzes_failed': 0,
+        'questions': 0, 'extraction_seconds': 0.0, 'started_at': time.perf_counter()
+    }
+    
+    # Only PDFs with at least one unfinished quiz are extracted
+    jobs = {}
+    for path in paths:
+        pending = [
+            (difficulty, job_key(path, difficulty, num_questions)) for difficulty in difficulties
+            if job_key(path, difficulty, num_questions) not in finished
+        ]
+        if pending:
+            jobs[path] = pending
+        else:
+            summary['pdfs_skipped'] += 1
+    
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    checkpoint_file = open(checkpoint_path, 'a', encoding='utf-8')
+    output_file = open(output, 'a', encoding='utf-8') if output != 'db' else None
+    
+    async def generate_quiz(path, text, content_hash, difficulty, key):
+        async with semaphore:
+            try:
+                # Generated fresh: serving from the pool would remove the questions it is meant to fill
+                questions = await asyncio.to_thread(
+                    generate_mcqs, text, difficulty, num_questions,
+                    pdf_filename=os.path.basename(path), backend=backend,
+                    max_concurrency=concurrency, use_cache=False, document_key=content_hash
+                )
+                if output == 'db':
+                    # Keyed on the file's content hash, the pool is the one the app serves for this PDF
+                    await asyncio.to_thread(
+                        db_manager.add_cached_questions,
+                        question_cache_key(content_hash, difficulty, backend.model_name), questions,
+                        model_name=backend.model_name, difficulty=difficulty
+                    )
+            except Exception as e:
+                print(f"Error generating {difficulty} quiz for {path}: {str(e)}")
+                summary['quizzes_failed'] += 1
+                return
+        
+        async with write_lock:
+            if output_file is not None:
+                output_file.write(json.dumps({
+                    'pdf': path,
+                    'pdf_filename': os.path.basename(path),
+                    'difficulty': difficulty,
+                    'model_name': backend.model_name,
+                    'generated_at': datetime.utcnow().isoformat(),
+                    'questions': questions
+                }) + '\n')
+                output_file.flush()
+            checkpoint_file.write(json.dumps({'key': key, 'questions': len(questions)}) + '\n')
+            checkpoint_file.flush()
+        
+        summary['quizzes'] += 1
+        summary['questions'] += len(questions)
+        print(f"{difficulty:<6} {len(questions):>3} questions  {path}")
+    
+    async def process_pdf(path, extraction):
+        result = await extraction
+        summary['extraction_seconds'] += result['seconds']
+        if result['error']:
+            print(f"Error extracting {path}: {result['error']}")
+            summary['pdfs_failed'] += 1
+            return
+        
+        await asyncio.gather(*(
+            generate_quiz(path, result['text'], result['content_hash'], difficulty, key)
+            for difficulty, key in jobs[path]
+        ))
+        summary['pdfs'] += 1
+    
+    # Create the schema before the workers start, so they never race each other to create it
+    from database import db_manager
+    
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, extract_workers), initializer=init_extraction_worker) as pool:
+            await asyncio.gather(*(
+                process_pdf(path, loop.run_in_executor(pool, extract_pdf_file, path)) for path in jobs
+            ))
+    finally:
+        checkpoint_file.close()
+        if output_file is not None:
+            output_file.close()
+    
+    summary['elapsed_seconds'] = time.perf_counter() - summary.pop('started_at')
+    summary['backend'] = backend.get_metrics()
+    return summary
+
+def format_summary(summary):
+    """
+    Format the throughput summary of a batch run
+    
+    Args:
+        summary (dict): Counters returned by run_batch
+    
+    Returns:
+        str: Summary text
+    """
+    minutes = summary['elapsed_seconds'] / 60
+    backend = summary['backend']
+    lines = [
+        f"PDFs processed:   {summary['pdfs']} ({summary['pdfs_failed']} failed, {summary['pdfs_skipped']} already done)",
+        f"Quizzes built:    {summary['quizzes']} ({summary['quizzes_failed']} failed)",
+        f"Questions:        {summary['questions']}",
+        f"Elapsed:          {summary['elapsed_seconds']:.1f}s (extraction {summary['extraction_seconds']:.1f}s of worker time)",
+        f"Throughput:       {summary['pdfs'] / minutes if minutes else 0:.1f} PDFs/min, "
+        f"{summary['questions'] / minutes if minutes else 0:.1f} questions/min",
+        f"Model calls:      {backend['calls']} ({backend['errors']} errors, {backend['retries']} retries, "
+        f"avg {backend['average_latency']:.2f}s)"
+    ]
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate quizzes for every PDF in a folder or manifest")
+    parser.add_argument('directory', nargs='?', help="Folder searched recursively for PDFs")
+    parser.add_argument('--manifest', help="Text file listing one PDF path per line")
+    parser.add_argument('--difficulty', nargs='+', choices=DIFFICULTIES, default=list(DIFFICULTIES),
+                        help="Difficulty levels to build a quiz for")
+    parser.add_argument('--questions', type=int, default=10, help="Questions per quiz")
+    parser.add_argument('--output', default='db', help="'db' for the app's question pool, or a .jsonl file to append to")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="File recording finished quizzes")
+    parser.add_argument('--extract-workers', type=int, default=PDF_EXTRACTION_WORKERS,
+                        help="Processes used for text extraction")
+    parser.add_argument('--concurrency', type=int, default=MCQ_MAX_CONCURRENCY, help="Quizzes generated at once")
+    parser.add_argument('--provider', help="LLM provider, defaults to LLM_PROVIDER")
+    args = parser.parse_args()
+    
+    if not args.directory and not args.manifest:
+        parser.error("give a PDF folder or --manifest")
+    
+    paths = collect_pdf_paths(args.directory, args.manifest)
+    if not paths:
+        print("No PDF files found.")
+        return
+    
+    summary = asyncio.run(run_batch(
+        paths, args.difficulty, args.questions, output=args.output, checkpoint_path=args.checkpoint,
+        extract_workers=args.extract_workers, concurrency=args.concurrency, backend=get_backend(args.provider)
+    ))
+    print(format_summary(summary))
+
+if __name__ == "__main__":
+    main()
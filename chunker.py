@@ -0,0 +1,112 @@
+import re
+
+# Target size of one chunk and of the document context sent in one prompt
+CHUNK_TOKEN_BUDGET = 500
+PROMPT_CONTEXT_TOKEN_BUDGET = 2000
+
+# Rough characters per token for English text
+CHARS_PER_TOKEN = 4
+
+_SECTION_SPLIT_RE = re.compile(r'\n\n|\f')
+_SENTENCE_RE = re.compile(r'[^.!?]+[.!?]*')
+
+def estimate_tokens(text):
+    """
+    Estimate the number of model tokens in a text
+    
+    Args:
+        text (str): Text to measure
+    
+    Returns:
+        int: Approximate token count
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def chunk_document(text, token_budget=CHUNK_TOKEN_BUDGET):
+    """
+    Split a document into deterministic, section-aware chunks
+    
+    Paragraphs and pages are packed together in document order until the
+    next one would exceed the budget; a paragraph larger than the budget
+    is split on sentence boundaries, and a sentence larger than the budget
+    on the character limit.
+    
+    Args:
+        text (str): Cleaned text from pdf_processor
+        token_budget (int): Maximum estimated tokens per chunk
+    
+    Returns:
+        list: Chunk strings in document order
+    """
+    max_chars = token_budget * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_length = 0
+    
+    def flush():
+        nonlocal current, current_length
+        if current:
+            chunks.append('\n\n'.join(current))
+        current = []
+        current_length = 0
+    
+    for section in _SECTION_SPLIT_RE.split(text):
+        section = section.strip()
+        if not section:
+            continue
+        
+        pieces = [section]
+        if len(section) > max_chars:
+            pieces = []
+            for sentence in _SENTENCE_RE.findall(section):
+                sentence = sentence.strip()
+                pieces.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+        
+        for piece_number, piece in enumerate(pieces):
+            if current and current_length + len(piece) + 2 > max_chars:
+                flush()
+            # Sentences of the same paragraph stay on one line
+            if piece_number and current:
+                current[-1] += ' ' + piece
+            else:
+                current.append(piece)
+            current_length += len(piece) + 2
+        
+        # Keep whole paragraphs together where they fit, but never join a split one with the next
+        if len(pieces) > 1:
+            flush()
+    
+    flush()
+    return chunks
+
+def select_chunks(coverage_counts, num_prompts=1, chunks_per_prompt=1):
+    """
+    Pick the least-covered chunks for one or more prompts
+    
+    Chunks are taken in order of (times used, position) so repeated quizzes
+    walk through the whole document; each prompt gets distinct chunks while
+    there are enough of them, returned in document order.
+    
+    Args:
+        coverage_counts (list): Times each chunk has been sent to the model
+        num_prompts (int): Number of prompts to fill
+        chunks_per_prompt (int): Chunks per prompt
+    
+    Returns:
+        list: One sorted list of chunk indexes per prompt
+    """
+    if not coverage_counts:
+        return [[] for _ in range(num_prompts)]
+    
+    ranked = sorted(range(len(coverage_counts)), key=lambda i: (coverage_counts[i], i))
+    per_prompt = min(chunks_per_prompt, len(ranked))
+    
+    selections = []
+    position = 0
+    for _ in range(num_prompts):
+        selection = set()
+        while len(selection) < per_prompt:
+            selection.add(ranked[position % len(ranked)])
+            position += 1
+        selections.append(sorted(selection))
+    return selections
@@ -1,14 +1,49 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, LargeBinary, Index, func, inspect, text, select, insert, delete, cast, case, tuple_
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.orm import sessionmaker, relationship, selectinload
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.sql import bindparam
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
 import streamlit as st
+from near_duplicates import minhash_signature, band_keys, pack_signature, unpack_signature, estimate_similarity, NEAR_DUPLICATE_THRESHOLD
 
-# Database configuration
-DATABASE_URL = os.environ.get("DATABASE_URL")
+# Database configuration: any SQLAlchemy URL (e.g. postgresql://...), SQLite on local disk by default
+DATABASE_URL = os.environ.get("DATABASE_URL") or "sqlite:///quiz_database.db"
+# Connections kept open in the pool, extra connections allowed under load, and seconds to wait for one
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT_SECONDS = int(os.environ.get("DB_POOL_TIMEOUT_SECONDS", 30))
+# Server connections are replaced after this many seconds, before proxies or the server drop them
+DB_POOL_RECYCLE_SECONDS = int(os.environ.get("DB_POOL_RECYCLE_SECONDS", 1800))
+# Milliseconds a SQLite connection waits for another writer's lock before failing
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+# Bump when the stored page format changes so older cached extractions are re-read
+EXTRACTION_CACHE_VERSION = 2
+# Upper bound on the total size of cached PDF text kept in extraction_cache
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+# Lifetime of pooled generated questions and maximum number of pools kept
+QUESTION_CACHE_TTL_SECONDS = int(os.environ.get("QUESTION_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+QUESTION_CACHE_MAX_ENTRIES = int(os.environ.get("QUESTION_CACHE_MAX_ENTRIES", 1000))
+# Seconds an unfinished quiz stays in saved_quiz_states before it is dropped
+QUIZ_STATE_TTL_SECONDS = int(os.environ.get("QUIZ_STATE_TTL_SECONDS", 24 * 3600))
+# Bound parameters per IN (...) query, below SQLite's limit
+IN_QUERY_CHUNK_SIZE = 500
+# Questions shown per page when viewing a past quiz
+QUESTION_PAGE_SIZE = 10
 Base = declarative_base()
 
+def hash_question_text(question_text):
+    """Hash a question for dedup, ignoring case and whitespace differences"""
+    normalized = ' '.join(question_text.lower().split())
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()
+
 class QuizSession(Base):
     """Store quiz session information"""
     __tablename__ = 'quiz_sessions'
@@ -20,13 +55,41 @@ class QuizSession(Base):
     correct_answers = Column(Integer)
     total_questions = Column(Integer)
     completed_at = Column(DateTime, default=datetime.utcnow)
+    attempt_id = Column(String(32))  # Set by the app so a rerun never saves the same attempt twice
+    
+    # Questions in the order they were asked; no foreign key so existing databases need no rebuild
+    questions = relationship(
+        'Question',
+        primaryjoin='QuizSession.id == foreign(Question.session_id)',
+        order_by='Question.id',
+        viewonly=True
+    )
+    
+    __table_args__ = (
+        Index('ix_quiz_sessions_attempt_id', 'attempt_id', unique=True),
+        # Keyset pagination of history, unfiltered and filtered by PDF or difficulty
+        Index('ix_quiz_sessions_completed', 'completed_at', 'id'),
+        Index('ix_quiz_sessions_pdf_completed', 'pdf_filename', 'completed_at', 'id'),
+        Index('ix_quiz_sessions_difficulty_completed', 'difficulty', 'completed_at', 'id'),
+    )
+
+class PerformanceSummary(Base):
+    """Running totals of completed quizzes per difficulty, updated with every saved session"""
+    __tablename__ = 'performance_summary'
+    
+    id = Column(Integer, primary_key=True)
+    difficulty = Column(String, nullable=False, unique=True)
+    quiz_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    best_score = Column(Float, nullable=False, default=0.0)
+    questions_sum = Column(Integer, nullable=False, default=0)
 
 class Question(Base):
     """Store individual questions and answers"""
     __tablename__ = 'questions'
     
     id = Column(Integer, primary_key=True)
-    session_id = Column(Integer, nullable=False)
+    session_id = Column(Integer, nullable=False, index=True)
     question_text = Column(String, nullable=False)
     option_a = Column(String, nullable=False)
     option_b = Column(String, nullable=False)
@@ -37,6 +100,17 @@ class Question(Base):
     is_correct = Column(Boolean)
     explanation = Column(String)
 
+class SavedQuizState(Base):
+    """Serialized state of an unfinished quiz, so a reloaded page can resume it"""
+    __tablename__ = 'saved_quiz_states'
+    
+    id = Column(Integer, primary_key=True)
+    attempt_id = Column(String(32), nullable=False, unique=True, index=True)
+    pdf_filename = Column(String)
+    difficulty = Column(String)
+    state = Column(LargeBinary, nullable=False)  # QuizManager.serialize() output
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 class UsedQuestion(Base):
     """Track questions that have been asked to avoid repetition"""
     __tablename__ = 'used_questions'
@@ -44,54 +118,413 @@ class UsedQuestion(Base):
     id = Column(Integer, primary_key=True)
     pdf_filename = Column(String)
     question_text = Column(String)
+    question_hash = Column(String(32))
+    minhash_signature = Column(LargeBinary)
     used_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('ix_used_questions_pdf_hash', 'pdf_filename', 'question_hash'),
+    )
+
+class UsedQuestionBand(Base):
+    """LSH band keys of used questions, for near-duplicate candidate lookup"""
+    __tablename__ = 'used_question_bands'
+    
+    id = Column(Integer, primary_key=True)
+    pdf_filename = Column(String)
+    band_key = Column(String(16), nullable=False)
+    used_question_id = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        Index('ix_used_question_bands_pdf_band', 'pdf_filename', 'band_key'),
+    )
+
+class ExtractionCache(Base):
+    """Cache extracted PDF text keyed by the SHA-256 of the uploaded bytes"""
+    __tablename__ = 'extraction_cache'
+    
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False, unique=True, index=True)
+    text_content = Column(Text, nullable=False)
+    page_texts = Column(Text, nullable=False)  # JSON encoded list of per-page text
+    size_bytes = Column(Integer, nullable=False)
+    format_version = Column(Integer)  # EXTRACTION_CACHE_VERSION the entry was written with
+    hits = Column(Integer, default=0)  # Lookups served from this entry
+    misses = Column(Integer, default=0)  # Lookups that had to extract the PDF and store it here
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed = Column(DateTime, default=datetime.utcnow, index=True)
+
+class PooledQuestion(Base):
+    """One generated question in the pool for a document, difficulty, prompt version and model"""
+    __tablename__ = 'pooled_questions'
+    
+    id = Column(Integer, primary_key=True)
+    cache_key = Column(String(64), nullable=False)
+    question_hash = Column(String(32), nullable=False)
+    model_name = Column(String)
+    difficulty = Column(String)
+    question_data = Column(Text, nullable=False)  # JSON encoded question dict
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        # One row per question, so concurrent writers to a pool never overwrite each other
+        Index('ix_pooled_questions_key_hash', 'cache_key', 'question_hash', unique=True),
+    )
+
+class ChunkCoverage(Base):
+    """Count how often each chunk of a document has been sent to the model"""
+    __tablename__ = 'chunk_coverage'
+    
+    id = Column(Integer, primary_key=True)
+    document_key = Column(String(64), nullable=False)
+    pdf_filename = Column(String)
+    chunk_index = Column(Integer, nullable=False)
+    times_used = Column(Integer, nullable=False, default=0)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('ix_chunk_coverage_document_chunk', 'document_key', 'chunk_index', unique=True),
+    )
+
+class GenerationMetric(Base):
+    """Prompt size, token usage and outcome of one question generation request"""
+    __tablename__ = 'generation_metrics'
+    
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    source = Column(String)  # "request" or "refill"
+    pdf_filename = Column(String)
+    difficulty = Column(String)
+    provider = Column(String)
+    model_name = Column(String)
+    requested_questions = Column(Integer)
+    pool_questions = Column(Integer)
+    model_requested_questions = Column(Integer)
+    validated_questions = Column(Integer)
+    returned_questions = Column(Integer)
+    model_calls = Column(Integer)
+    prompt_chars = Column(Integer)
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    retries = Column(Integer)
+    latency_seconds = Column(Float)
+    succeeded = Column(Boolean)
+
+def create_database_engine(database_url=DATABASE_URL):
+    """
+    Create the pooled engine for a database URL
+    
+    SQLite connections are switched to WAL journaling so readers never
+    block the single writer, with a busy timeout instead of immediate
+    "database is locked" errors. An in-memory SQLite database exists only
+    within its connection, so it gets a single connection shared by all
+    threads instead of a pool.
+    
+    Args:
+        database_url (str): SQLAlchemy database URL
+    
+    Returns:
+        Engine: SQLAlchemy engine
+    """
+    # Hosting platforms still hand out the scheme SQLAlchemy 1.4 dropped
+    if database_url.startswith("postgres://"):
+        database_url = "postgresql://" + database_url[len("postgres://"):]
+    
+    pool_options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT_SECONDS,
+        'pool_pre_ping': True
+    }
+    
+    url = make_url(database_url)
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(database_url, pool_recycle=DB_POOL_RECYCLE_SECONDS, **pool_options)
+    
+    if url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory':
+        return create_engine(database_url, poolclass=StaticPool, connect_args={'check_same_thread': False})
+    
+    engine = create_engine(
+        database_url,
+        poolclass=QueuePool,
+        connect_args={'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000},
+        **pool_options
+    )
+    event.listen(engine, 'connect', _set_sqlite_pragmas)
+    return engine
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # With WAL, NORMAL only risks the last transactions on power loss, never corruption
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.close()
 
 class DatabaseManager:
     """Manage database operations for the quiz application"""
     
-    def __init__(self):
-        # Use SQLite as default database
-        self.engine = create_engine('sqlite:///quiz_database.db')
+    def __init__(self, database_url=DATABASE_URL):
+        self.engine = create_database_engine(database_url)
         Base.metadata.create_all(self.engine)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        self._migrate_schema()
+        # Loaded attributes stay readable after the session closes, so results can leave session_scope
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
     
-    def save_quiz_session(self, pdf_filename, difficulty, questions, user_answers):
-        """Save a completed quiz session to the database"""
+    @contextmanager
+    def session_scope(self):
+        """
+        Provide a short-lived session for one unit of work
+        
+        Each call checks a connection out of the pool and returns it when
+        the block ends, committing on success and rolling back on error, so
+        no session or transaction is ever shared between threads or users.
+        
+        Yields:
+            Session: SQLAlchemy session
+        """
+        session = self.Session()
         try:
-            correct_answers = sum(1 for q, a in zip(questions, user_answers) if q['correct_answer'] == a)
-            total_questions = len(questions)
-            score_percentage = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    def _migrate_schema(self):
+        """Add columns and indexes introduced after a database was first created"""
+        inspector = inspect(self.engine)
+        
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing_columns:
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+        
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(self.engine, checkfirst=True)
+        
+        self._backfill_used_questions()
+        self._backfill_performance_summary()
+    
+    def _backfill_used_questions(self):
+        """Fill in hashes, MinHash signatures and LSH bands for used questions recorded without them"""
+        used_table = UsedQuestion.__table__
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                select(used_table.c.id, used_table.c.pdf_filename, used_table.c.question_text)
+                .where(used_table.c.minhash_signature.is_(None))
+            ).fetchall()
+            if not rows:
+                return
             
-            quiz_session = QuizSession(
-                pdf_filename=pdf_filename,
-                difficulty=difficulty,
-                score_percentage=score_percentage,
-                correct_answers=correct_answers,
-                total_questions=total_questions
+            updates = []
+            bands = []
+            for row in rows:
+                question_text = row.question_text or ''
+                signature = minhash_signature(question_text)
+                updates.append({
+                    'row_id': row.id,
+                    'row_hash': hash_question_text(question_text),
+                    'row_signature': pack_signature(signature)
+                })
+                bands.extend(
+                    {'pdf_filename': row.pdf_filename, 'band_key': key, 'used_question_id': row.id}
+                    for key in band_keys(signature)
+                )
+            
+            connection.execute(
+                used_table.update()
+                          .where(used_table.c.id == bindparam('row_id'))
+                          .values(question_hash=bindparam('row_hash'),
+                                  minhash_signature=bindparam('row_signature')),
+                updates
             )
+            connection.execute(insert(UsedQuestionBand.__table__), bands)
+    
+    def _backfill_performance_summary(self):
+        """Build the performance summary from quiz_sessions for databases created before it existed"""
+        summary_table = PerformanceSummary.__table__
+        sessions_table = QuizSession.__table__
+        with self.engine.begin() as connection:
+            if connection.execute(select(func.count()).select_from(summary_table)).scalar():
+                return
             
-            self.session.add(quiz_session)
-            self.session.commit()
-            return quiz_session.id
-        except Exception as e:
-            self.session.rollback()
-            print(f"Error saving quiz session: {str(e)}")
-            return None
+            difficulty = func.coalesce(sessions_table.c.difficulty, 'N/A')
+            connection.execute(summary_table.insert().from_select(
+                ['difficulty', 'quiz_count', 'score_sum', 'best_score', 'questions_sum'],
+                select(
+                    difficulty,
+                    func.count(sessions_table.c.id),
+                    func.coalesce(func.sum(sessions_table.c.score_percentage), 0.0),
+                    func.coalesce(func.max(sessions_table.c.score_percentage), 0.0),
+                    func.coalesce(func.sum(sessions_table.c.total_questions), 0)
+                ).group_by(difficulty)
+            ))
+    
+    def _add_to_performance_summary(self, session, difficulty, score_percentage, total_questions):
+        """Add one completed quiz to the running totals of its difficulty"""
+        summary_table = PerformanceSummary.__table__
+        updated = session.execute(
+            summary_table.update()
+                         .where(summary_table.c.difficulty == difficulty)
+                         .values(
+                             quiz_count=summary_table.c.quiz_count + 1,
+                             score_sum=summary_table.c.score_sum + score_percentage,
+                             best_score=case(
+                                 (summary_table.c.best_score < score_percentage, score_percentage),
+                                 else_=summary_table.c.best_score
+                             ),
+                             questions_sum=summary_table.c.questions_sum + total_questions
+                         )
+        ).rowcount
+        if not updated:
+            session.add(PerformanceSummary(
+                difficulty=difficulty,
+                quiz_count=1,
+                score_sum=score_percentage,
+                best_score=score_percentage,
+                questions_sum=total_questions
+            ))
     
-    def get_quiz_history(self, limit=20):
-        """Get recent quiz history"""
+    def save_quiz_session(self, pdf_filename, difficulty, questions, user_answers, correct_flags=None,
+                          attempt_id=None, mark_used=False, attempts=2):
+        """
+        Save a completed quiz session to the database
+        
+        The session row, one Question row per question, the performance
+        summary and (with mark_used) the used-question records are written
+        in a single transaction with bulk inserts. Saving an attempt_id that
+        is already stored writes nothing and returns the existing session.
+        Correctness comes from correct_flags when the caller has already
+        scored the answers, e.g. QuizManager.get_correct_flags().
+        """
+        if correct_flags is None:
+            correct_flags = [q['correct_answer'] == a for q, a in zip(questions, user_answers)]
+        correct_answers = sum(correct_flags)
+        total_questions = len(questions)
+        score_percentage = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
+        
+        for attempt in range(attempts):
+            try:
+                with self.session_scope() as session:
+                    if attempt_id is not None:
+                        existing_id = session.query(QuizSession.id).filter_by(attempt_id=attempt_id).scalar()
+                        if existing_id is not None:
+                            return existing_id
+                    
+                    quiz_session = QuizSession(
+                        pdf_filename=pdf_filename,
+                        difficulty=difficulty,
+                        score_percentage=score_percentage,
+                        correct_answers=correct_answers,
+                        total_questions=total_questions,
+                        attempt_id=attempt_id
+                    )
+                    session.add(quiz_session)
+                    session.flush()
+                    
+                    question_rows = []
+                    for question, user_answer, is_correct in zip(questions, user_answers, correct_flags):
+                        options = list(question.get('options', [])) + [''] * 4
+                        question_rows.append({
+                            'session_id': quiz_session.id,
+                            'question_text': question['question'],
+                            'option_a': options[0],
+                            'option_b': options[1],
+                            'option_c': options[2],
+                            'option_d': options[3],
+                            'correct_answer': question['correct_answer'],
+                            'user_answer': user_answer,
+                            'is_correct': is_correct,
+                            'explanation': question.get('explanation', '')
+                        })
+                    if question_rows:
+                        session.execute(insert(Question), question_rows)
+                    
+                    self._add_to_performance_summary(session, difficulty or 'N/A', score_percentage, total_questions)
+                    if mark_used:
+                        self._insert_used_questions(session, pdf_filename, questions)
+                return quiz_session.id
+            except IntegrityError:
+                # A concurrent save of the same attempt, or of the first quiz at this
+                # difficulty, won the race; the retry finds its rows
+                continue
+            except Exception as e:
+                print(f"Error saving quiz session: {str(e)}")
+                return None
+        
+        print("Error saving quiz session: concurrent saves kept conflicting")
+        return None
+    
+    def get_quiz_history(self, limit=20, before=None, pdf_filename=None, difficulty=None, since=None, until=None):
+        """
+        Get one page of quiz history, newest first
+        
+        Pages are keyset paginated on (completed_at, id): pass the cursor of
+        the last session of a page to get the next one, which costs the same
+        index range scan however far back it is.
+        
+        Args:
+            limit (int): Maximum sessions to return
+            before (tuple): (completed_at, id) cursor; only older sessions are returned
+            pdf_filename (str): Only sessions for this PDF
+            difficulty (str): Only sessions at this difficulty
+            since (datetime): Only sessions completed at or after this time
+            until (datetime): Only sessions completed before this time
+        
+        Returns:
+            list: QuizSession rows
+        """
         try:
-            return self.session.query(QuizSession).order_by(QuizSession.completed_at.desc()).limit(limit).all()
+            with self.session_scope() as session:
+                query = session.query(QuizSession)
+                if pdf_filename:
+                    query = query.filter(QuizSession.pdf_filename == pdf_filename)
+                if difficulty:
+                    query = query.filter(QuizSession.difficulty == difficulty)
+                if since is not None:
+                    query = query.filter(QuizSession.completed_at >= since)
+                if until is not None:
+                    query = query.filter(QuizSession.completed_at < until)
+                if before is not None:
+                    query = query.filter(tuple_(QuizSession.completed_at, QuizSession.id) < tuple_(*before))
+                
+                return query.order_by(QuizSession.completed_at.desc(), QuizSession.id.desc()).limit(limit).all()
         except Exception as e:
             print(f"Error getting quiz history: {str(e)}")
             return []
     
+    def get_history_filter_options(self):
+        """Get the PDF names and difficulties that appear in quiz history"""
+        try:
+            with self.session_scope() as session:
+                pdf_filenames = [
+                    row[0] for row in session.query(QuizSession.pdf_filename).distinct().order_by(QuizSession.pdf_filename)
+                    if row[0]
+                ]
+                difficulties = [
+                    row[0] for row in session.query(PerformanceSummary.difficulty).order_by(PerformanceSummary.difficulty)
+                ]
+            return {'pdf_filenames': pdf_filenames, 'difficulties': difficulties}
+        except Exception as e:
+            print(f"Error getting history filters: {str(e)}")
+            return {'pdf_filenames': [], 'difficulties': []}
+    
     def get_performance_stats(self):
-        """Get overall performance statistics"""
+        """Get overall performance statistics from the per-difficulty running totals"""
         try:
-            sessions = self.session.query(QuizSession).all()
-            if not sessions:
+            with self.session_scope() as session:
+                summaries = session.query(PerformanceSummary).filter(PerformanceSummary.quiz_count > 0).all()
+            if not summaries:
                 return {
                     'total_quizzes': 0,
                     'average_score': 0,
@@ -100,14 +533,13 @@ class DatabaseManager:
                     'favorite_difficulty': 'N/A'
                 }
             
-            total_quizzes = len(sessions)
-            average_score = sum(s.score_percentage for s in sessions) / total_quizzes
-            best_score = max(s.score_percentage for s in sessions)
-            total_questions = sum(s.total_questions for s in sessions)
+            total_quizzes = sum(s.quiz_count for s in summaries)
+            average_score = sum(s.score_sum for s in summaries) / total_quizzes
+            best_score = max(s.best_score for s in summaries)
+            total_questions = sum(s.questions_sum for s in summaries)
             
             # Get most common difficulty
-            difficulties = [s.difficulty for s in sessions]
-            favorite_difficulty = max(set(difficulties), key=difficulties.count)
+            favorite_difficulty = max(summaries, key=lambda s: s.quiz_count).difficulty
             
             return {
                 'total_quizzes': total_quizzes,
@@ -126,24 +558,41 @@ class DatabaseManager:
                 'favorite_difficulty': 'N/A'
             }
     
-    def get_quiz_details(self, session_id):
-        """Get detailed information about a specific quiz session"""
-        if not self.session:
-            return None
-            
-        session = None
+    def get_quiz_details(self, session_id, offset=0, limit=None):
+        """
+        Get detailed information about a specific quiz session
+        
+        Costs two queries however many questions the quiz has: the session
+        row, then its questions (eager loaded, or one page of them).
+        
+        Args:
+            session_id (int): Quiz session id
+            offset (int): Index of the first question to return
+            limit (int): Number of questions to return, None for all
+        
+        Returns:
+            dict: session_info and questions, or None if the session does not exist
+        """
         try:
-            session = self.session
-            
-            # Get quiz session
-            quiz_session = session.query(QuizSession).filter_by(id=session_id).first()
-            
-            if not quiz_session:
-                session.close()
-                return None
-            
-            # Get questions for this session
-            questions = session.query(Question).filter_by(session_id=session_id).all()
+            with self.session_scope() as session:
+                if limit is None and not offset:
+                    quiz_session = session.query(QuizSession)\
+                                          .options(selectinload(QuizSession.questions))\
+                                          .filter_by(id=session_id)\
+                                          .first()
+                    if not quiz_session:
+                        return None
+                    questions = quiz_session.questions
+                else:
+                    quiz_session = session.query(QuizSession).filter_by(id=session_id).first()
+                    if not quiz_session:
+                        return None
+                    questions = session.query(Question)\
+                                       .filter_by(session_id=session_id)\
+                                       .order_by(Question.id)\
+                                       .offset(offset)\
+                                       .limit(limit)\
+                                       .all()
             
             quiz_details = {
                 'session_info': {
@@ -168,51 +617,528 @@ class DatabaseManager:
                     'explanation': q.explanation
                 })
             
-            session.close()
             return quiz_details
-            
+        
         except Exception as e:
             print(f"Failed to retrieve quiz details: {str(e)}")
-            if session:
-                session.close()
             return None
     
+    def save_quiz_state(self, attempt_id, state, pdf_filename=None, difficulty=None,
+                        ttl_seconds=QUIZ_STATE_TTL_SECONDS, attempts=2):
+        """
+        Store or replace the serialized state of an unfinished quiz
+        
+        Saved states older than the TTL are dropped at the same time.
+        
+        Args:
+            attempt_id (str): Attempt the state belongs to
+            state (bytes): QuizManager.serialize() output
+            pdf_filename (str): Name of the PDF the quiz is from
+            difficulty (str): Difficulty level of the quiz
+            ttl_seconds (int): Seconds an unfinished quiz is kept
+        
+        Returns:
+            bool: True if the state was stored
+        """
+        for attempt in range(attempts):
+            try:
+                now = datetime.utcnow()
+                with self.session_scope() as session:
+                    session.query(SavedQuizState)\
+                           .filter(SavedQuizState.updated_at < now - timedelta(seconds=ttl_seconds))\
+                           .delete(synchronize_session=False)
+                    
+                    entry = session.query(SavedQuizState).filter_by(attempt_id=attempt_id).first()
+                    if entry is None:
+                        entry = SavedQuizState(attempt_id=attempt_id)
+                        session.add(entry)
+                    entry.pdf_filename = pdf_filename
+                    entry.difficulty = difficulty
+                    entry.state = state
+                    entry.updated_at = now
+                return True
+            except IntegrityError:
+                # A concurrent save of the same attempt inserted it first; the retry updates it
+                continue
+            except Exception as e:
+                print(f"Error saving quiz state: {str(e)}")
+                return False
+        return False
+    
+    def load_quiz_state(self, attempt_id, ttl_seconds=QUIZ_STATE_TTL_SECONDS):
+        """
+        Get the saved state of an unfinished quiz
+        
+        Args:
+            attempt_id (str): Attempt the state belongs to
+            ttl_seconds (int): Seconds an unfinished quiz is kept
+        
+        Returns:
+            dict: state, pdf_filename and difficulty, or None if nothing recent is saved
+        """
+        try:
+            with self.session_scope() as session:
+                entry = session.query(SavedQuizState)\
+                               .filter(SavedQuizState.attempt_id == attempt_id,
+                                       SavedQuizState.updated_at >= datetime.utcnow() - timedelta(seconds=ttl_seconds))\
+                               .first()
+                if entry is None:
+                    return None
+                return {
+                    'state': entry.state,
+                    'pdf_filename': entry.pdf_filename,
+                    'difficulty': entry.difficulty
+                }
+        except Exception as e:
+            print(f"Error loading quiz state: {str(e)}")
+            return None
+    
+    def delete_quiz_state(self, attempt_id):
+        """Drop the saved state of a quiz that was finished or abandoned"""
+        try:
+            with self.session_scope() as session:
+                session.query(SavedQuizState)\
+                       .filter_by(attempt_id=attempt_id)\
+                       .delete(synchronize_session=False)
+        except Exception as e:
+            print(f"Error deleting quiz state: {str(e)}")
+    
     def mark_questions_as_used(self, pdf_filename, questions):
         """Mark questions as used to avoid repetition"""
         try:
-            for question in questions:
-                used_question = UsedQuestion(
-                    pdf_filename=pdf_filename,
-                    question_text=question['question']
-                )
-                self.session.add(used_question)
-            self.session.commit()
+            with self.session_scope() as session:
+                self._insert_used_questions(session, pdf_filename, questions)
         except Exception as e:
-            self.session.rollback()
             print(f"Error marking questions as used: {str(e)}")
     
+    def _insert_used_questions(self, session, pdf_filename, questions):
+        """Bulk insert used-question rows and their LSH bands"""
+        if not questions:
+            return
+        
+        signatures = [
+            minhash_signature(question['question'], question.get('correct_answer', ''))
+            for question in questions
+        ]
+        used_table = UsedQuestion.__table__
+        used_ids = session.execute(
+            insert(used_table).returning(used_table.c.id, sort_by_parameter_order=True),
+            [
+                {
+                    'pdf_filename': pdf_filename,
+                    'question_text': question['question'],
+                    'question_hash': hash_question_text(question['question']),
+                    'minhash_signature': pack_signature(signature),
+                    'used_at': datetime.utcnow()
+                }
+                for question, signature in zip(questions, signatures)
+            ]
+        ).scalars().all()
+        
+        bands = [
+            {'pdf_filename': pdf_filename, 'band_key': key, 'used_question_id': used_id}
+            for used_id, signature in zip(used_ids, signatures)
+            for key in band_keys(signature)
+        ]
+        session.execute(insert(UsedQuestionBand), bands)
+    
     def get_used_question_hashes(self, pdf_filename):
-        """Get list of question hashes that have been used for this PDF"""
-        if not self.session:
-            return []
-            
-        session = None
+        """Get the set of question hashes that have been used for this PDF"""
         try:
-            session = self.session
-            
-            used_questions = session.query(UsedQuestion.question_text)\
-                                  .filter_by(pdf_filename=pdf_filename)\
-                                  .all()
+            with self.session_scope() as session:
+                rows = session.query(UsedQuestion.question_hash)\
+                              .filter_by(pdf_filename=pdf_filename)
+                return {row.question_hash for row in rows}
+        except Exception as e:
+            print(f"Failed to get used questions: {str(e)}")
+            return set()
+    
+    def find_used_question_hashes(self, pdf_filename, question_hashes):
+        """Get the subset of the given question hashes already used for this PDF"""
+        question_hashes = list(set(question_hashes))
+        used = set()
+        try:
+            with self.session_scope() as session:
+                for start in range(0, len(question_hashes), IN_QUERY_CHUNK_SIZE):
+                    chunk = question_hashes[start:start + IN_QUERY_CHUNK_SIZE]
+                    rows = session.query(UsedQuestion.question_hash)\
+                                  .filter(UsedQuestion.pdf_filename == pdf_filename,
+                                          UsedQuestion.question_hash.in_(chunk))\
+                                  .distinct()
+                    used.update(row.question_hash for row in rows)
+            return used
+        except Exception as e:
+            print(f"Failed to look up used questions: {str(e)}")
+            return set()
+    
+    def find_near_duplicate_positions(self, pdf_filename, signatures, threshold=NEAR_DUPLICATE_THRESHOLD):
+        """Get the positions of signatures that nearly duplicate a question already used for this PDF"""
+        try:
+            # Candidate used questions are those sharing at least one LSH band
+            keys_by_position = [band_keys(signature) for signature in signatures]
+            all_keys = list({key for keys in keys_by_position for key in keys})
+            candidates_by_key = {}
+            candidate_signatures = {}
+            with self.session_scope() as session:
+                for start in range(0, len(all_keys), IN_QUERY_CHUNK_SIZE):
+                    rows = session.query(UsedQuestionBand.band_key, UsedQuestionBand.used_question_id)\
+                                  .filter(UsedQuestionBand.pdf_filename == pdf_filename,
+                                          UsedQuestionBand.band_key.in_(all_keys[start:start + IN_QUERY_CHUNK_SIZE]))
+                    for band_key, used_question_id in rows:
+                        candidates_by_key.setdefault(band_key, set()).add(used_question_id)
+                
+                candidate_ids = list(set().union(*candidates_by_key.values())) if candidates_by_key else []
+                for start in range(0, len(candidate_ids), IN_QUERY_CHUNK_SIZE):
+                    rows = session.query(UsedQuestion.id, UsedQuestion.minhash_signature)\
+                                  .filter(UsedQuestion.id.in_(candidate_ids[start:start + IN_QUERY_CHUNK_SIZE]))
+                    for used_question_id, packed in rows:
+                        if packed:
+                            candidate_signatures[used_question_id] = unpack_signature(packed)
             
-            hashes = [q.question_text for q in used_questions]
-            session.close()
-            return hashes
+            duplicates = set()
+            for position, (signature, keys) in enumerate(zip(signatures, keys_by_position)):
+                ids = set().union(*(candidates_by_key.get(key, ()) for key in keys))
+                if any(
+                    estimate_similarity(signature, candidate_signatures[i]) >= threshold
+                    for i in ids if i in candidate_signatures
+                ):
+                    duplicates.add(position)
+            return duplicates
+        except Exception as e:
+            print(f"Failed to look up near-duplicate questions: {str(e)}")
+            return set()
+    
+    def is_question_used(self, pdf_filename, question_text):
+        """Check whether a single question has been used for this PDF"""
+        try:
+            with self.session_scope() as session:
+                query = session.query(UsedQuestion.id)\
+                               .filter_by(pdf_filename=pdf_filename,
+                                          question_hash=hash_question_text(question_text))
+                return session.query(query.exists()).scalar()
+        except Exception as e:
+            print(f"Failed to check used question: {str(e)}")
+            return False
+    
+    def get_cached_extraction(self, content_hash):
+        """Get cached extraction for a PDF content hash and refresh its LRU timestamp"""
+        try:
+            with self.session_scope() as session:
+                entry = session.query(ExtractionCache).filter_by(content_hash=content_hash).first()
+                if not entry or entry.format_version != EXTRACTION_CACHE_VERSION:
+                    return None
+                
+                entry.last_accessed = datetime.utcnow()
+                # Counted in SQL so lookups from other processes are never lost
+                entry.hits = func.coalesce(ExtractionCache.hits, 0) + 1
+                return {
+                    'text': entry.text_content,
+                    'pages': json.loads(entry.page_texts)
+                }
+        except Exception as e:
+            print(f"Error reading extraction cache: {str(e)}")
+            return None
+    
+    def save_cached_extraction(self, content_hash, text_content, page_texts, max_bytes=EXTRACTION_CACHE_MAX_BYTES):
+        """Store an extraction result and evict least recently used entries over the size limit"""
+        try:
+            page_json = json.dumps(page_texts)
+            size_bytes = len(text_content.encode('utf-8')) + len(page_json.encode('utf-8'))
+            if size_bytes > max_bytes:
+                return
             
+            with self.session_scope() as session:
+                entry = session.query(ExtractionCache).filter_by(content_hash=content_hash).first()
+                if entry is None:
+                    entry = ExtractionCache(content_hash=content_hash, hits=0, misses=1)
+                    session.add(entry)
+                else:
+                    entry.misses = func.coalesce(ExtractionCache.misses, 0) + 1
+                entry.text_content = text_content
+                entry.page_texts = page_json
+                entry.size_bytes = size_bytes
+                entry.format_version = EXTRACTION_CACHE_VERSION
+                entry.last_accessed = datetime.utcnow()
+                session.flush()
+                
+                # Evict least recently used entries until the cache fits
+                total_bytes = session.query(func.coalesce(func.sum(ExtractionCache.size_bytes), 0)).scalar()
+                if total_bytes > max_bytes:
+                    candidates = session.query(ExtractionCache.id, ExtractionCache.size_bytes)\
+                                        .filter(ExtractionCache.content_hash != content_hash)\
+                                        .order_by(ExtractionCache.last_accessed.asc())
+                    evict_ids = []
+                    for entry_id, entry_size in candidates:
+                        if total_bytes <= max_bytes:
+                            break
+                        evict_ids.append(entry_id)
+                        total_bytes -= entry_size
+                    if evict_ids:
+                        session.query(ExtractionCache)\
+                               .filter(ExtractionCache.id.in_(evict_ids))\
+                               .delete(synchronize_session=False)
         except Exception as e:
-            print(f"Failed to get used questions: {str(e)}")
-            if session:
-                session.close()
+            print(f"Error saving extraction cache: {str(e)}")
+    
+    def get_extraction_cache_stats(self):
+        """
+        Get the size and hit/miss counts of the extraction cache, across all processes
+        
+        Counts of evicted entries are dropped with them.
+        
+        Returns:
+            dict: entries, size_bytes, hits, misses and hit_rate
+        """
+        try:
+            with self.session_scope() as session:
+                row = session.query(
+                    func.count(ExtractionCache.id),
+                    func.coalesce(func.sum(ExtractionCache.size_bytes), 0),
+                    func.coalesce(func.sum(ExtractionCache.hits), 0),
+                    func.coalesce(func.sum(ExtractionCache.misses), 0)
+                ).one()
+            entries, size_bytes, hits, misses = row
+            lookups = hits + misses
+            return {
+                'entries': entries,
+                'size_bytes': size_bytes,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': (hits / lookups) if lookups else 0.0
+            }
+        except Exception as e:
+            print(f"Error reading extraction cache stats: {str(e)}")
+            return None
+    
+    def get_cached_questions(self, cache_key, ttl_seconds=QUESTION_CACHE_TTL_SECONDS):
+        """Get the pooled questions for a key in the order they were added, dropping those older than the TTL"""
+        try:
+            now = datetime.utcnow()
+            with self.session_scope() as session:
+                session.query(PooledQuestion)\
+                       .filter(PooledQuestion.cache_key == cache_key,
+                               PooledQuestion.created_at < now - timedelta(seconds=ttl_seconds))\
+                       .delete(synchronize_session=False)
+                
+                rows = session.query(PooledQuestion.question_data)\
+                              .filter_by(cache_key=cache_key)\
+                              .order_by(PooledQuestion.id)\
+                              .all()
+                if not rows:
+                    return None
+                
+                session.query(PooledQuestion)\
+                       .filter_by(cache_key=cache_key)\
+                       .update({'last_accessed': now}, synchronize_session=False)
+                return [json.loads(row.question_data) for row in rows]
+        except Exception as e:
+            print(f"Error reading question cache: {str(e)}")
+            return None
+    
+    def add_cached_questions(self, cache_key, questions, model_name=None, difficulty=None,
+                             max_entries=QUESTION_CACHE_MAX_ENTRIES, attempts=2):
+        """Add questions not yet pooled to the pool for a key and evict least recently used pools over the limit"""
+        if not questions:
+            return
+        
+        for attempt in range(attempts):
+            try:
+                now = datetime.utcnow()
+                by_hash = {}
+                for question in questions:
+                    by_hash.setdefault(hash_question_text(question['question']), question)
+                
+                with self.session_scope() as session:
+                    pooled_hashes = {
+                        row.question_hash for row in session.query(PooledQuestion.question_hash)
+                                                            .filter(PooledQuestion.cache_key == cache_key,
+                                                                    PooledQuestion.question_hash.in_(list(by_hash)))
+                    }
+                    new_rows = [
+                        {
+                            'cache_key': cache_key,
+                            'question_hash': question_hash,
+                            'model_name': model_name,
+                            'difficulty': difficulty,
+                            'question_data': json.dumps(question),
+                            'created_at': now,
+                            'last_accessed': now
+                        }
+                        for question_hash, question in by_hash.items() if question_hash not in pooled_hashes
+                    ]
+                    if new_rows:
+                        session.execute(insert(PooledQuestion), new_rows)
+                    
+                    session.query(PooledQuestion)\
+                           .filter_by(cache_key=cache_key)\
+                           .update({'last_accessed': now}, synchronize_session=False)
+                    self._evict_question_pools(session, cache_key, max_entries)
+                return
+            except IntegrityError:
+                # A concurrent writer pooled some of the same questions first; retry without them
+                continue
+            except Exception as e:
+                print(f"Error saving question cache: {str(e)}")
+                return
+    
+    def remove_cached_questions(self, cache_key, questions):
+        """
+        Remove questions from the pool for a key
+        
+        Served and already used questions are removed so the pool only holds
+        questions still to be asked. Each pooled question is removed by one
+        caller only, which makes this the way to claim questions for serving.
+        
+        Args:
+            cache_key (str): Question pool key
+            questions (list): Question dictionaries
+        
+        Returns:
+            list: The given questions that were still pooled, in the given order
+        """
+        if not questions:
+            return []
+        
+        try:
+            question_hashes = [hash_question_text(question['question']) for question in questions]
+            pooled_table = PooledQuestion.__table__
+            with self.session_scope() as session:
+                removed_hashes = set(session.execute(
+                    delete(pooled_table)
+                    .where(pooled_table.c.cache_key == cache_key,
+                           pooled_table.c.question_hash.in_(set(question_hashes)))
+                    .returning(pooled_table.c.question_hash)
+                ).scalars())
+            removed_questions = []
+            for question, question_hash in zip(questions, question_hashes):
+                if question_hash in removed_hashes:
+                    removed_hashes.discard(question_hash)
+                    removed_questions.append(question)
+            return removed_questions
+        except Exception as e:
+            print(f"Error removing pooled questions: {str(e)}")
             return []
+    
+    def _evict_question_pools(self, session, keep_cache_key, max_entries):
+        """Delete the least recently used question pools beyond the pool limit"""
+        pool_count = session.query(func.count(func.distinct(PooledQuestion.cache_key))).scalar()
+        if pool_count <= max_entries:
+            return
+        
+        evict_keys = [
+            row.cache_key for row in session.query(PooledQuestion.cache_key)
+                                            .filter(PooledQuestion.cache_key != keep_cache_key)
+                                            .group_by(PooledQuestion.cache_key)
+                                            .order_by(func.max(PooledQuestion.last_accessed).asc())
+                                            .limit(pool_count - max_entries)
+        ]
+        session.query(PooledQuestion)\
+               .filter(PooledQuestion.cache_key.in_(evict_keys))\
+               .delete(synchronize_session=False)
+    
+    def get_chunk_coverage(self, document_key, chunk_count):
+        """Get how often each chunk of a document has been used, as a list indexed by chunk"""
+        coverage = [0] * chunk_count
+        try:
+            with self.session_scope() as session:
+                rows = session.query(ChunkCoverage.chunk_index, ChunkCoverage.times_used)\
+                              .filter(ChunkCoverage.document_key == document_key,
+                                      ChunkCoverage.chunk_index < chunk_count)
+                for chunk_index, times_used in rows:
+                    coverage[chunk_index] = times_used
+        except Exception as e:
+            print(f"Error reading chunk coverage: {str(e)}")
+        return coverage
+    
+    def record_chunk_coverage(self, document_key, chunk_indexes, pdf_filename=None, attempts=2):
+        """Increment the usage count of the given chunks of a document"""
+        if not chunk_indexes:
+            return
+        
+        for attempt in range(attempts):
+            try:
+                counts = {}
+                for chunk_index in chunk_indexes:
+                    counts[chunk_index] = counts.get(chunk_index, 0) + 1
+                
+                now = datetime.utcnow()
+                with self.session_scope() as session:
+                    existing = session.query(ChunkCoverage)\
+                                      .filter(ChunkCoverage.document_key == document_key,
+                                              ChunkCoverage.chunk_index.in_(list(counts)))
+                    for row in existing:
+                        row.times_used += counts.pop(row.chunk_index)
+                        row.last_used_at = now
+                    
+                    for chunk_index, count in counts.items():
+                        session.add(ChunkCoverage(
+                            document_key=document_key,
+                            pdf_filename=pdf_filename,
+                            chunk_index=chunk_index,
+                            times_used=count,
+                            last_used_at=now
+                        ))
+                return
+            except IntegrityError:
+                # Another worker inserted the same chunks first; retry as an update
+                continue
+            except Exception as e:
+                print(f"Error recording chunk coverage: {str(e)}")
+                return
+    
+    def save_generation_metric(self, record):
+        """Store the metrics of one question generation request"""
+        try:
+            with self.session_scope() as session:
+                session.add(GenerationMetric(**record))
+        except Exception as e:
+            print(f"Error saving generation metrics: {str(e)}")
+    
+    def get_generation_report(self, since=None, group_by='model_name'):
+        """Aggregate generation metrics per model, provider, difficulty, source or PDF"""
+        group_column = getattr(GenerationMetric, group_by)
+        try:
+            with self.session_scope() as session:
+                query = session.query(
+                    group_column.label('group'),
+                    func.count(GenerationMetric.id).label('requests'),
+                    func.sum(GenerationMetric.model_calls).label('model_calls'),
+                    func.sum(GenerationMetric.retries).label('retries'),
+                    func.avg(GenerationMetric.prompt_chars).label('avg_prompt_chars'),
+                    func.avg(GenerationMetric.prompt_tokens).label('avg_prompt_tokens'),
+                    func.avg(GenerationMetric.completion_tokens).label('avg_completion_tokens'),
+                    func.sum(GenerationMetric.prompt_tokens).label('prompt_tokens'),
+                    func.sum(GenerationMetric.completion_tokens).label('completion_tokens'),
+                    func.sum(GenerationMetric.requested_questions).label('requested_questions'),
+                    func.sum(GenerationMetric.pool_questions).label('pool_questions'),
+                    func.sum(GenerationMetric.model_requested_questions).label('model_requested_questions'),
+                    func.sum(GenerationMetric.validated_questions).label('validated_questions'),
+                    func.avg(GenerationMetric.latency_seconds).label('avg_latency'),
+                    func.max(GenerationMetric.latency_seconds).label('max_latency'),
+                    func.sum(cast(GenerationMetric.succeeded, Integer)).label('succeeded')
+                )
+                if since is not None:
+                    query = query.filter(GenerationMetric.created_at >= since)
+                return [row._asdict() for row in query.group_by(group_column).order_by(group_column)]
+        except Exception as e:
+            print(f"Error building generation report: {str(e)}")
+            return []
+
+# Global database manager instance, created on first use so that importing this
+# module for another database (as the benchmarks do) never creates the default one
+_db_manager = None
+_db_manager_lock = threading.Lock()
+
+def get_db_manager():
+    """Get the global database manager for DATABASE_URL, creating it on first use"""
+    global _db_manager
+    with _db_manager_lock:
+        if _db_manager is None:
+            _db_manager = DatabaseManager()
+        return _db_manager
 
-# Global database manager instance
-db_manager = DatabaseManager()
\ No newline at end of file
+def __getattr__(name):
+    # Keeps "from database import db_manager" working while the instance is created lazily
+    if name == 'db_manager':
+        return get_db_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,152 @@
+"""
+Stress concurrent save_quiz_session calls and check what they stored
+
+Every save writes a quiz session, its questions, used-question records
+and the performance summary for the run's own difficulty; one save in
+ten is repeated with the same attempt_id from another thread. After each
+thread count the stored rows are compared with what was saved, so lost
+or duplicated writes show up as mismatches rather than only as speed.
+Throughput is reported relative to one thread: SQLite has a single
+writer, so more threads are not expected to make saves faster.
+
+Writes real rows, so it uses a scratch database unless --url
+names another one.
+
+Usage:
+    python db_benchmark.py [--url DATABASE_URL] [--threads 1 4 16] [--saves N]
+"""
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from database import DatabaseManager, QuizSession, Question, UsedQuestion, PerformanceSummary
+
+# Every DUPLICATE_EVERY-th attempt is saved twice, concurrently with its first save
+DUPLICATE_EVERY = 10
+
+def run_benchmark(manager, threads, saves, questions_per_quiz=10):
+    """
+    Save quiz sessions from several threads at once and verify the stored totals
+    
+    Args:
+        manager (DatabaseManager): Database to write to
+        threads (int): Concurrent writer threads
+        saves (int): Distinct quiz attempts to save
+        questions_per_quiz (int): Questions per saved session
+    
+    Returns:
+        dict: saves, failures, saves per second and a list of mismatches between saved and stored totals
+    """
+    run_id = uuid.uuid4().hex[:8]
+    pdf_filename = f"db_benchmark-{run_id}.pdf"
+    difficulty = f"benchmark-{run_id}"
+    questions = [
+        {'question': f"Question {i}?", 'options': ['A) Yes', 'B) No', 'C) Maybe', 'D) Never'],
+         'correct_answer': 'A) Yes'}
+        for i in range(questions_per_quiz)
+    ]
+    attempts = [f"{run_id}-{i}" for i in range(saves)]
+    jobs = []
+    for i, attempt_id in enumerate(attempts):
+        jobs.append((i, attempt_id))
+        if i % DUPLICATE_EVERY == 0:
+            jobs.append((i, attempt_id))
+    
+    def correct_count(i):
+        return i % (questions_per_quiz + 1)
+    
+    def save(job):
+        i, attempt_id = job
+        answers = ['A) Yes'] * correct_count(i)
+        answers += ['B) No'] * (questions_per_quiz - len(answers))
+        return manager.save_quiz_session(
+            pdf_filename, difficulty, questions, answers, attempt_id=attempt_id, mark_used=True
+        )
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        session_ids = list(executor.map(save, jobs))
+    elapsed = time.perf_counter() - start
+    
+    saved = len({session_id for session_id in session_ids if session_id})
+    return {
+        'saves': saved,
+        'failures': saves - saved,
+        'saves_per_second': len(jobs) / elapsed if elapsed else 0.0,
+        'mismatches': verify_totals(
+            manager, pdf_filename, difficulty, questions_per_quiz,
+            [correct_count(i) / questions_per_quiz * 100 for i in range(saves)]
+        )
+    }
+
+def verify_totals(manager, pdf_filename, difficulty, questions_per_quiz, scores):
+    """
+    Compare the rows stored by a run with the attempts it saved
+    
+    Args:
+        manager (DatabaseManager): Database written to
+        pdf_filename (str): PDF name used by the run
+        difficulty (str): Difficulty used by the run
+        questions_per_quiz (int): Questions per saved session
+        scores (list): Score percentage of each distinct attempt
+    
+    Returns:
+        list: Descriptions of totals that do not match, empty when all do
+    """
+    with manager.session_scope() as session:
+        session_ids = session.query(QuizSession.id).filter_by(pdf_filename=pdf_filename)
+        stored = {
+            'quiz sessions': session_ids.count(),
+            'questions': session.query(func.count(Question.id))
+                                .filter(Question.session_id.in_(session_ids.scalar_subquery())).scalar(),
+            'used questions': session.query(func.count(UsedQuestion.id))
+                                     .filter_by(pdf_filename=pdf_filename).scalar()
+        }
+        summary = session.query(PerformanceSummary).filter_by(difficulty=difficulty).first()
+        stored['summary quiz count'] = summary.quiz_count if summary else 0
+        stored['summary questions'] = summary.questions_sum if summary else 0
+        stored['summary score sum'] = round(summary.score_sum, 6) if summary else 0
+    
+    expected = {
+        'quiz sessions': len(scores),
+        'questions': len(scores) * questions_per_quiz,
+        'used questions': len(scores) * questions_per_quiz,
+        'summary quiz count': len(scores),
+        'summary questions': len(scores) * questions_per_quiz,
+        'summary score sum': round(sum(scores), 6)
+    }
+    return [
+        f"{name}: stored {stored[name]}, expected {expected[name]}"
+        for name in expected if stored[name] != expected[name]
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent quiz session saves and verify the stored totals")
+    parser.add_argument('--url', default="sqlite:///db_benchmark.db",
+                        help="Scratch database URL, defaults to sqlite:///db_benchmark.db")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16], help="Writer thread counts to try")
+    parser.add_argument('--saves', type=int, default=500, help="Distinct sessions saved per thread count")
+    args = parser.parse_args()
+    
+    manager = DatabaseManager(args.url)
+    print(f"{'threads':>7}  {'saves':>6}  {'failed':>6}  {'saves/s':>8}  {'vs 1st':>6}  totals")
+    baseline = None
+    mismatched = False
+    for threads in args.threads:
+        result = run_benchmark(manager, threads, args.saves)
+        baseline = baseline or result['saves_per_second']
+        verdict = 'ok' if not result['mismatches'] else f"{len(result['mismatches'])} MISMATCHED"
+        print(f"{threads:>7}  {result['saves']:>6}  {result['failures']:>6}  {result['saves_per_second']:>8.0f}  "
+              f"{result['saves_per_second'] / baseline:>5.2f}x  {verdict}")
+        for mismatch in result['mismatches']:
+            print(f"         {mismatch}")
+        mismatched = mismatched or bool(result['mismatches'] or result['failures'])
+    
+    if mismatched:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
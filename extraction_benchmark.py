@@ -0,0 +1,106 @@
+"""
+Measure PDF text extraction time with different worker process counts
+
+Builds a synthetic text-only PDF in memory, so no input file is needed and
+nothing is written to the extraction cache.
+
+Usage:
+    python extraction_benchmark.py [--pages N] [--workers 1 2 4] [--repeat N]
+"""
+import argparse
+import random
+import time
+
+from pdf_processor import extract_page_texts, PDF_EXTRACTION_WORKERS
+
+_WORDS = (
+    "cell membrane protein energy transport gradient enzyme reaction substrate "
+    "molecule structure function pathway signal receptor binding diffusion"
+).split()
+
+def build_sample_pdf(page_count, lines_per_page=45, seed=7):
+    """
+    Build a PDF whose pages hold lines of random words
+    
+    Args:
+        page_count (int): Number of pages
+        lines_per_page (int): Text lines on each page
+        seed (int): Seed for the generated words
+    
+    Returns:
+        bytes: PDF file content
+    """
+    rng = random.Random(seed)
+    page_ids = [4 + 2 * i for i in range(page_count)]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {page_count} >>".encode(),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    }
+    for page_id in page_ids:
+        lines = [' '.join(rng.choice(_WORDS) for _ in range(12)) + '.' for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + ' '.join(f"({line}) Tj T*" for line in lines) + " ET"
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode()
+        objects[page_id + 1] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode()
+    
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(output)
+        output += f"{object_id} 0 obj\n".encode() + objects[object_id] + b"\nendobj\n"
+    
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for object_id in sorted(objects):
+        output += f"{offsets[object_id]:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    return bytes(output)
+
+def run_benchmark(pdf_bytes, workers, repeat=3):
+    """
+    Time extract_page_texts with a given worker count
+    
+    Args:
+        pdf_bytes (bytes): PDF file content
+        workers (int): Worker processes
+        repeat (int): Runs to take the best time of
+    
+    Returns:
+        tuple: (best seconds, extracted page texts)
+    """
+    best = None
+    page_texts = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        page_texts = extract_page_texts(pdf_bytes, workers=workers)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, page_texts
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel PDF text extraction")
+    parser.add_argument('--pages', type=int, default=200, help="Pages in the generated PDF")
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, PDF_EXTRACTION_WORKERS}),
+                        help="Worker process counts to try")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per worker count, best time is reported")
+    args = parser.parse_args()
+    
+    pdf_bytes = build_sample_pdf(args.pages)
+    print(f"{args.pages} pages, {len(pdf_bytes) / 1024:.0f} KB")
+    print(f"{'workers':>7}  {'seconds':>8}  {'speedup':>7}")
+    
+    baseline = None
+    baseline_texts = None
+    for workers in args.workers:
+        seconds, page_texts = run_benchmark(pdf_bytes, workers, args.repeat)
+        if baseline is None:
+            baseline, baseline_texts = seconds, page_texts
+        elif page_texts != baseline_texts:
+            raise Exception(f"Extraction with {workers} workers returned different text")
+        print(f"{workers:>7}  {seconds:>8.3f}  {baseline / seconds:>6.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Report prompt size, token usage and latency of question generation, and
+how well the PDF extraction cache works
+
+Usage:
+    python generation_report.py [--days N] [--by model_name|provider|difficulty|source|pdf_filename]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from database import db_manager
+
+GROUP_CHOICES = ['model_name', 'provider', 'difficulty', 'source', 'pdf_filename']
+
+def format_report(rows, group_by):
+    """
+    Format aggregated generation metrics as a text table
+    
+    Args:
+        rows (list): Rows from DatabaseManager.get_generation_report
+        group_by (str): Column the rows are grouped by
+    
+    Returns:
+        str: Report text
+    """
+    headers = [
+        group_by, 'requests', 'ok %', 'calls', 'retries', 'avg prompt chars', 'avg prompt tok',
+        'avg compl tok', 'tok/question', 'valid %', 'pool %', 'avg s', 'max s'
+    ]
+    table = [headers]
+    
+    for row in rows:
+        requests = row['requests'] or 0
+        validated = row['validated_questions'] or 0
+        model_requested = row['model_requested_questions'] or 0
+        requested = row['requested_questions'] or 0
+        total_tokens = (row['prompt_tokens'] or 0) + (row['completion_tokens'] or 0)
+        table.append([
+            str(row['group']),
+            str(requests),
+            f"{100 * (row['succeeded'] or 0) / requests:.0f}" if requests else '-',
+            str(row['model_calls'] or 0),
+            str(row['retries'] or 0),
+            f"{row['avg_prompt_chars'] or 0:.0f}",
+            f"{row['avg_prompt_tokens'] or 0:.0f}",
+            f"{row['avg_completion_tokens'] or 0:.0f}",
+            f"{total_tokens / validated:.0f}" if validated else '-',
+            f"{100 * validated / model_requested:.0f}" if model_requested else '-',
+            f"{100 * (row['pool_questions'] or 0) / requested:.0f}" if requested else '-',
+            f"{row['avg_latency'] or 0:.2f}",
+            f"{row['max_latency'] or 0:.2f}"
+        ])
+    
+    widths = [max(len(line[i]) for line in table) for i in range(len(headers))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(line, widths)))
+        for line in table
+    )
+
+def format_extraction_cache_stats(stats):
+    """
+    Format the extraction cache counters as one line
+    
+    Args:
+        stats (dict): Result of DatabaseManager.get_extraction_cache_stats
+    
+    Returns:
+        str: Summary line
+    """
+    return (
+        f"Extraction cache: {stats['entries']} PDFs, {stats['size_bytes'] / 1024 / 1024:.1f} MB, "
+        f"{stats['hits']} hits, {stats['misses']} misses ({100 * stats['hit_rate']:.0f}% hit rate)"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize question generation metrics")
+    parser.add_argument('--days', type=float, default=7, help="Only include requests from the last N days (0 for all)")
+    parser.add_argument('--by', choices=GROUP_CHOICES, default='model_name', help="Column to group by")
+    args = parser.parse_args()
+    
+    since = datetime.utcnow() - timedelta(days=args.days) if args.days else None
+    rows = db_manager.get_generation_report(since=since, group_by=args.by)
+    if rows:
+        print(format_report(rows, args.by))
+    else:
+        print("No generation metrics recorded for this period.")
+    
+    cache_stats = db_manager.get_extraction_cache_stats()
+    if cache_stats is not None:
+        print()
+        print(format_extraction_cache_stats(cache_stats))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measure hint lookup speed and relevance on a large generated document
+
+Builds a document of random sentences, asks a question about a random
+sentence and checks whether that sentence is among the hints. Compares
+DocumentIndex.rank_sentences with the keyword scan the hint panel used
+before the index existed.
+
+Usage:
+    python hint_benchmark.py [--sentences N] [--queries N]
+"""
+import argparse
+import random
+import time
+
+from pdf_processor import PAGE_BREAK
+from text_index import DocumentIndex
+
+SENTENCES_PER_PAGE = 40
+
+def build_sample_document(sentence_count, vocabulary_size=5000, seed=3):
+    """
+    Build a document of random sentences with page breaks
+    
+    Args:
+        sentence_count (int): Number of sentences
+        vocabulary_size (int): Number of distinct words
+        seed (int): Seed for the generated text
+    
+    Returns:
+        tuple: (document text, list of sentence strings)
+    """
+    rng = random.Random(seed)
+    vocabulary = [
+        ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 10)))
+        for _ in range(vocabulary_size)
+    ]
+    sentences = [
+        ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(8, 20))).capitalize() + '.'
+        for _ in range(sentence_count)
+    ]
+    pages = [
+        ' '.join(sentences[start:start + SENTENCES_PER_PAGE])
+        for start in range(0, sentence_count, SENTENCES_PER_PAGE)
+    ]
+    return PAGE_BREAK.join(pages), sentences
+
+def keyword_scan(text, question, limit=3):
+    """The hint lookup used before DocumentIndex: first sentences sharing a long word"""
+    question_words = question.lower().split()
+    relevant_sentences = []
+    for sentence in text.split('.'):
+        if any(word in sentence.lower() for word in question_words if len(word) > 3):
+            relevant_sentences.append(sentence.strip())
+    return relevant_sentences[:limit]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hint passage lookup")
+    parser.add_argument('--sentences', type=int, default=20000, help="Sentences in the generated document")
+    parser.add_argument('--queries', type=int, default=200, help="Questions to look up")
+    args = parser.parse_args()
+    
+    text, sentences = build_sample_document(args.sentences)
+    rng = random.Random(5)
+    targets = [rng.randrange(len(sentences)) for _ in range(args.queries)]
+    questions = []
+    for target in targets:
+        words = sentences[target].rstrip('.').lower().split()
+        questions.append(f"Which of the following is true about {' '.join(rng.sample(words, min(4, len(words))))}?")
+    
+    start = time.perf_counter()
+    index = DocumentIndex(text)
+    build_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    ranked = [index.rank_sentences(question, limit=3) for question in questions]
+    rank_seconds = time.perf_counter() - start
+    rank_hits = sum(
+        any(index.get_sentence(i) == sentences[target] for i in ids) for ids, target in zip(ranked, targets)
+    )
+    
+    start = time.perf_counter()
+    scanned = [keyword_scan(text, question) for question in questions]
+    scan_seconds = time.perf_counter() - start
+    scan_hits = sum(
+        sentences[target].rstrip('.') in hints for hints, target in zip(scanned, targets)
+    )
+    
+    print(f"{len(index)} sentences, {len(text) / 1024 / 1024:.1f} MB, index built in {build_seconds:.2f}s")
+    print(f"{'method':<16} {'ms/query':>9} {'source in top 3':>16}")
+    print(f"{'BM25 index':<16} {rank_seconds / len(questions) * 1000:>9.3f} {rank_hits / len(questions):>16.0%}")
+    print(f"{'keyword scan':<16} {scan_seconds / len(questions) * 1000:>9.3f} {scan_hits / len(questions):>16.0%}")
+
+if __name__ == "__main__":
+    main()
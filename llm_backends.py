@@ -0,0 +1,680 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from llm_resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, backoff_delay, is_transient_error
+
+# Provider used when callers do not pick one
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini")
+
+# Default model per provider, overridable with LLM_MODEL
+DEFAULT_MODELS = {
+    'gemini': 'gemini-1.5-flash',
+    'openai': 'gpt-4o-mini',
+    'anthropic': 'claude-3-5-haiku-latest',
+    'fake': 'fake',
+}
+
+# Transient failures (timeouts, rate limits, 5xx) are retried with exponential backoff and jitter
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE_SECONDS = float(os.environ.get("LLM_BACKOFF_BASE_SECONDS", 0.5))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", 8))
+
+# Seconds before a single model call is abandoned, 0 to wait indefinitely
+LLM_CALL_TIMEOUT_SECONDS = float(os.environ.get("LLM_CALL_TIMEOUT_SECONDS", 120))
+
+# Consecutive transient failures that open the circuit, and seconds until a trial call is let through
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("LLM_CIRCUIT_FAILURE_THRESHOLD", 5))
+LLM_CIRCUIT_RESET_SECONDS = float(os.environ.get("LLM_CIRCUIT_RESET_SECONDS", 30))
+
+# Send a second request when the first is slower than the recent p95 latency (doubles spend on slow calls)
+LLM_HEDGE_REQUESTS = os.environ.get("LLM_HEDGE_REQUESTS", "0") == "1"
+LLM_HEDGE_PERCENTILE = 0.95
+LLM_HEDGE_MIN_SAMPLES = 20
+
+# Worker threads for blocking calls made under a timeout or hedge; abandoned calls finish here
+_call_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("LLM_CALL_THREADS", 16)), thread_name_prefix="llm-call"
+)
+
+# Long-lived backend instances, one per (provider, model)
+_backend_instances = {}
+_backend_lock = threading.Lock()
+
+# Event loop, started on first use, that runs every async model call
+_async_loop = None
+_async_loop_thread = None
+_async_loop_lock = threading.Lock()
+
+def run_async(coroutine):
+    """
+    Run a coroutine on the shared model-call event loop and wait for its result
+    
+    Async SDK clients keep their connections bound to the event loop that
+    opened them, so all async calls go through one persistent loop in a
+    dedicated thread instead of a new asyncio.run() loop per request. Safe
+    to call from any thread except the loop's own.
+    
+    Args:
+        coroutine: Coroutine to run
+    
+    Returns:
+        The coroutine's result
+    """
+    global _async_loop, _async_loop_thread
+    with _async_loop_lock:
+        if _async_loop is None:
+            _async_loop = asyncio.new_event_loop()
+            _async_loop_thread = threading.Thread(
+                target=_async_loop.run_forever, name="llm-event-loop", daemon=True
+            )
+            _async_loop_thread.start()
+    
+    if threading.current_thread() is _async_loop_thread:
+        coroutine.close()
+        raise Exception("run_async() cannot wait on the model-call event loop from inside it")
+    return asyncio.run_coroutine_threadsafe(coroutine, _async_loop).result()
+
+class LLMBackend:
+    """
+    Interface for the language model used to generate questions
+    
+    Subclasses implement _generate() and optionally _generate_async(),
+    returning the response text with prompt and completion token counts.
+    The public generate()/generate_async() wrappers record latency and
+    token metrics so providers can be compared on equal terms, and make
+    every call resilient: a per-call timeout, retries of transient failures
+    with backoff and jitter, a circuit breaker and optional hedged requests.
+    """
+    
+    name = 'base'
+    
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.max_retries = LLM_MAX_RETRIES
+        self.call_timeout = LLM_CALL_TIMEOUT_SECONDS
+        self.hedge_requests = LLM_HEDGE_REQUESTS
+        self.circuit_breaker = CircuitBreaker(LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS)
+        self.latencies = LatencyTracker()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'calls': 0,
+            'errors': 0,
+            'retries': 0,
+            'timeouts': 0,
+            'hedged_requests': 0,
+            'rejected_calls': 0,
+            'total_latency': 0.0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0
+        }
+    
+    def generate(self, prompt, temperature=0.7, max_output_tokens=4000):
+        """
+        Generate a completion for a prompt
+        
+        Args:
+            prompt (str): Full prompt text
+            temperature (float): Sampling temperature
+            max_output_tokens (int): Completion token limit
+        
+        Returns:
+            str: Response text
+        """
+        return self.generate_with_usage(prompt, temperature, max_output_tokens)[0]
+    
+    async def generate_async(self, prompt, temperature=0.7, max_output_tokens=4000):
+        """Asynchronous variant of generate()"""
+        return (await self.generate_with_usage_async(prompt, temperature, max_output_tokens))[0]
+    
+    def generate_with_usage(self, prompt, temperature=0.7, max_output_tokens=4000, stats=None):
+        """
+        Generate a completion and report its token usage
+        
+        Args:
+            prompt (str): Full prompt text
+            temperature (float): Sampling temperature
+            max_output_tokens (int): Completion token limit
+            stats (dict): Generation metrics record whose 'retries' counter is increased
+        
+        Returns:
+            tuple: (response_text, prompt_tokens, completion_tokens)
+        
+        Raises:
+            CircuitOpenError: If the provider keeps failing and calls are being short-circuited
+        """
+        attempt = 0
+        while True:
+            trial = self._before_call()
+            start = time.perf_counter()
+            try:
+                text, prompt_tokens, completion_tokens = self._call_with_deadline(prompt, temperature, max_output_tokens)
+            except Exception as e:
+                if not self._handle_failure(e, time.perf_counter() - start, attempt, stats):
+                    raise
+                attempt += 1
+                time.sleep(backoff_delay(attempt, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS))
+                continue
+            finally:
+                self._end_call(trial)
+            self._handle_success(time.perf_counter() - start, prompt_tokens, completion_tokens)
+            return text, prompt_tokens or 0, completion_tokens or 0
+    
+    async def generate_with_usage_async(self, prompt, temperature=0.7, max_output_tokens=4000, stats=None):
+        """Asynchronous variant of generate_with_usage()"""
+        attempt = 0
+        while True:
+            trial = self._before_call()
+            start = time.perf_counter()
+            try:
+                text, prompt_tokens, completion_tokens = await self._call_with_deadline_async(
+                    prompt, temperature, max_output_tokens
+                )
+            except Exception as e:
+                if not self._handle_failure(e, time.perf_counter() - start, attempt, stats):
+                    raise
+                attempt += 1
+                await asyncio.sleep(backoff_delay(attempt, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS))
+                continue
+            finally:
+                self._end_call(trial)
+            self._handle_success(time.perf_counter() - start, prompt_tokens, completion_tokens)
+            return text, prompt_tokens or 0, completion_tokens or 0
+    
+    def stream(self, prompt, temperature=0.7, max_output_tokens=4000, stats=None):
+        """
+        Generate a completion, yielding text as it arrives
+        
+        Token usage is estimated from the text length, as streamed
+        responses do not report it consistently across providers. A
+        transient failure is retried only if it happens before the first
+        piece of text; streams are not timed out or hedged.
+        
+        Args:
+            prompt (str): Full prompt text
+            temperature (float): Sampling temperature
+            max_output_tokens (int): Completion token limit
+            stats (dict): Generation metrics record whose 'retries' counter is increased
+        
+        Yields:
+            str: Pieces of the response text
+        """
+        attempt = 0
+        while True:
+            trial = self._before_call()
+            start = time.perf_counter()
+            received = 0
+            try:
+                for piece in self._stream(prompt, temperature, max_output_tokens):
+                    if piece:
+                        received += len(piece)
+                        yield piece
+            except Exception as e:
+                # Text already handed to the caller cannot be taken back
+                if not self._handle_failure(e, time.perf_counter() - start, attempt, stats) or received:
+                    raise
+                attempt += 1
+                time.sleep(backoff_delay(attempt, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS))
+                continue
+            finally:
+                # Also runs when the caller closes the stream early
+                self._end_call(trial)
+            self._handle_success(time.perf_counter() - start, -(-len(prompt) // 4), -(-received // 4))
+            return
+    
+    def _generate(self, prompt, temperature, max_output_tokens):
+        raise NotImplementedError
+    
+    def _stream(self, prompt, temperature, max_output_tokens):
+        # Backends without streaming support return the whole response at once
+        yield self._generate(prompt, temperature, max_output_tokens)[0]
+    
+    async def _generate_async(self, prompt, temperature, max_output_tokens):
+        # Run the blocking call in a worker thread so any backend can be fanned out
+        return await asyncio.to_thread(self._generate, prompt, temperature, max_output_tokens)
+    
+    def _hedge_delay(self):
+        """Seconds after which a hedged request is sent, or None when hedging is off"""
+        if not self.hedge_requests:
+            return None
+        return self.latencies.percentile(LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES)
+    
+    def _call_with_deadline(self, prompt, temperature, max_output_tokens):
+        """
+        Make one logical call under the timeout, hedging it when it runs slow
+        
+        The first successful response wins; a request still running at the
+        deadline is abandoned to finish in the background.
+        """
+        hedge_delay = self._hedge_delay()
+        if not self.call_timeout and hedge_delay is None:
+            return self._generate(prompt, temperature, max_output_tokens)
+        
+        start = time.monotonic()
+        deadline = start + self.call_timeout if self.call_timeout else None
+        hedge_at = start + hedge_delay if hedge_delay is not None else None
+        pending = {_call_executor.submit(self._generate, prompt, temperature, max_output_tokens)}
+        error = None
+        
+        while pending:
+            wake_times = [t for t in (deadline, hedge_at) if t is not None]
+            timeout = max(0.0, min(wake_times) - time.monotonic()) if wake_times else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            
+            now = time.monotonic()
+            if pending and deadline is not None and now >= deadline:
+                raise TimeoutError(f"Model call timed out after {self.call_timeout:g}s")
+            if pending and hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                self._count('hedged_requests')
+                pending.add(_call_executor.submit(self._generate, prompt, temperature, max_output_tokens))
+        
+        raise error
+    
+    async def _call_with_deadline_async(self, prompt, temperature, max_output_tokens):
+        """Asynchronous variant of _call_with_deadline(); losing requests are cancelled"""
+        hedge_delay = self._hedge_delay()
+        if not self.call_timeout and hedge_delay is None:
+            return await self._generate_async(prompt, temperature, max_output_tokens)
+        
+        start = time.monotonic()
+        deadline = start + self.call_timeout if self.call_timeout else None
+        hedge_at = start + hedge_delay if hedge_delay is not None else None
+        pending = {asyncio.ensure_future(self._generate_async(prompt, temperature, max_output_tokens))}
+        error = None
+        
+        try:
+            while pending:
+                wake_times = [t for t in (deadline, hedge_at) if t is not None]
+                timeout = max(0.0, min(wake_times) - time.monotonic()) if wake_times else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                
+                now = time.monotonic()
+                if pending and deadline is not None and now >= deadline:
+                    raise TimeoutError(f"Model call timed out after {self.call_timeout:g}s")
+                if pending and hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    self._count('hedged_requests')
+                    pending.add(asyncio.ensure_future(self._generate_async(prompt, temperature, max_output_tokens)))
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        raise error
+    
+    def _before_call(self):
+        try:
+            return self.circuit_breaker.before_call()
+        except CircuitOpenError:
+            self._count('rejected_calls')
+            raise
+    
+    def _end_call(self, trial):
+        # A trial call that was cancelled or closed early recorded no outcome; without this the circuit stays stuck
+        if trial:
+            self.circuit_breaker.release_trial()
+    
+    def _handle_success(self, latency, prompt_tokens, completion_tokens):
+        self.circuit_breaker.record_success()
+        self.latencies.add(latency)
+        self._record(latency, prompt_tokens, completion_tokens)
+    
+    def _handle_failure(self, error, latency, attempt, stats):
+        """
+        Record a failed call and decide whether to retry it
+        
+        Returns:
+            bool: True if the call should be retried
+        """
+        self._record(latency, error=True)
+        if isinstance(error, TimeoutError):
+            self._count('timeouts')
+        
+        if not is_transient_error(error):
+            # The provider answered; the request itself was rejected
+            self.circuit_breaker.record_success()
+            return False
+        
+        self.circuit_breaker.record_failure()
+        if attempt >= self.max_retries:
+            return False
+        
+        self._count('retries')
+        if stats is not None:
+            stats['retries'] += 1
+        return True
+    
+    def _count(self, metric):
+        with self._metrics_lock:
+            self._metrics[metric] += 1
+    
+    def _record(self, latency, prompt_tokens=0, completion_tokens=0, error=False):
+        with self._metrics_lock:
+            self._metrics['calls'] += 1
+            self._metrics['errors'] += int(error)
+            self._metrics['total_latency'] += latency
+            self._metrics['prompt_tokens'] += prompt_tokens or 0
+            self._metrics['completion_tokens'] += completion_tokens or 0
+    
+    def get_metrics(self):
+        """
+        Get call, latency and token counters for this backend
+        
+        Returns:
+            dict: Totals plus average latency per call and the circuit breaker state
+        """
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics['provider'] = self.name
+        metrics['model'] = self.model_name
+        metrics['average_latency'] = metrics['total_latency'] / metrics['calls'] if metrics['calls'] else 0.0
+        metrics['p95_latency'] = self.latencies.percentile(0.95, min_samples=1)
+        metrics['circuit_state'] = self.circuit_breaker.state
+        return metrics
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini backend"""
+    
+    name = 'gemini'
+    
+    def __init__(self, api_key, model_name=DEFAULT_MODELS['gemini']):
+        import google.generativeai as genai
+        
+        super().__init__(model_name)
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model = genai.GenerativeModel(model_name)
+    
+    def _generation_config(self, temperature, max_output_tokens):
+        return self._genai.types.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+        )
+    
+    @staticmethod
+    def _unpack(response):
+        usage = getattr(response, 'usage_metadata', None)
+        return (
+            response.text,
+            getattr(usage, 'prompt_token_count', 0),
+            getattr(usage, 'candidates_token_count', 0)
+        )
+    
+    def _generate(self, prompt, temperature, max_output_tokens):
+        response = self.model.generate_content(
+            prompt,
+            generation_config=self._generation_config(temperature, max_output_tokens)
+        )
+        return self._unpack(response)
+    
+    async def _generate_async(self, prompt, temperature, max_output_tokens):
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config=self._generation_config(temperature, max_output_tokens)
+        )
+        return self._unpack(response)
+    
+    def _stream(self, prompt, temperature, max_output_tokens):
+        response = self.model.generate_content(
+            prompt,
+            generation_config=self._generation_config(temperature, max_output_tokens),
+            stream=True
+        )
+        for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions backend"""
+    
+    name = 'openai'
+    
+    def __init__(self, api_key, model_name=DEFAULT_MODELS['openai']):
+        import openai
+        
+        super().__init__(model_name)
+        # Retries and timeouts are handled by LLMBackend; SDK retries would multiply the attempts
+        client_options = {'api_key': api_key, 'max_retries': 0, 'timeout': self.call_timeout or None}
+        self.client = openai.OpenAI(**client_options)
+        self.async_client = openai.AsyncOpenAI(**client_options)
+    
+    def _request(self, prompt, temperature, max_output_tokens):
+        return {
+            'model': self.model_name,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': temperature,
+            'max_tokens': max_output_tokens
+        }
+    
+    @staticmethod
+    def _unpack(response):
+        usage = response.usage
+        return (
+            response.choices[0].message.content or "",
+            getattr(usage, 'prompt_tokens', 0),
+            getattr(usage, 'completion_tokens', 0)
+        )
+    
+    def _generate(self, prompt, temperature, max_output_tokens):
+        response = self.client.chat.completions.create(**self._request(prompt, temperature, max_output_tokens))
+        return self._unpack(response)
+    
+    async def _generate_async(self, prompt, temperature, max_output_tokens):
+        response = await self.async_client.chat.completions.create(**self._request(prompt, temperature, max_output_tokens))
+        return self._unpack(response)
+    
+    def _stream(self, prompt, temperature, max_output_tokens):
+        response = self.client.chat.completions.create(stream=True, **self._request(prompt, temperature, max_output_tokens))
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+class AnthropicBackend(LLMBackend):
+    """Anthropic messages backend"""
+    
+    name = 'anthropic'
+    
+    def __init__(self, api_key, model_name=DEFAULT_MODELS['anthropic']):
+        import anthropic
+        
+        super().__init__(model_name)
+        # Retries and timeouts are handled by LLMBackend; SDK retries would multiply the attempts
+        client_options = {'api_key': api_key, 'max_retries': 0, 'timeout': self.call_timeout or None}
+        self.client = anthropic.Anthropic(**client_options)
+        self.async_client = anthropic.AsyncAnthropic(**client_options)
+    
+    def _request(self, prompt, temperature, max_output_tokens):
+        return {
+            'model': self.model_name,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': temperature,
+            'max_tokens': max_output_tokens
+        }
+    
+    @staticmethod
+    def _unpack(response):
+        text = "".join(block.text for block in response.content if getattr(block, 'type', '') == 'text')
+        return text, response.usage.input_tokens, response.usage.output_tokens
+    
+    def _generate(self, prompt, temperature, max_output_tokens):
+        response = self.client.messages.create(**self._request(prompt, temperature, max_output_tokens))
+        return self._unpack(response)
+    
+    async def _generate_async(self, prompt, temperature, max_output_tokens):
+        response = await self.async_client.messages.create(**self._request(prompt, temperature, max_output_tokens))
+        return self._unpack(response)
+    
+    def _stream(self, prompt, temperature, max_output_tokens):
+        with self.client.messages.stream(**self._request(prompt, temperature, max_output_tokens)) as response:
+            for text in response.text_stream:
+                yield text
+
+class FakeBackendError(Exception):
+    """Transient failure injected by FakeBackend"""
+    
+    status_code = 503
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic offline backend that builds questions from the prompt's own text
+    
+    Used to load-test and benchmark the generation pipeline without network
+    access; the injected latency simulates a slow provider and token counts
+    are estimated at four characters per token. Transient failures and
+    slow responses can be injected at random to exercise retries, the
+    circuit breaker and hedging.
+    """
+    
+    name = 'fake'
+    
+    _NUM_QUESTIONS_RE = re.compile(r'generate exactly (\d+)')
+    _TEXT_CONTENT_RE = re.compile(r'TEXT CONTENT:\n(.*?)\n\nREQUIREMENTS:', re.DOTALL)
+    _SENTENCE_RE = re.compile(r'[^.!?]{20,}[.!?]')
+    
+    def __init__(self, latency=0.0, model_name=DEFAULT_MODELS['fake'], failure_rate=0.0, slow_rate=0.0,
+                 slow_latency=0.0, seed=None):
+        """
+        Args:
+            latency (float): Seconds to wait before answering each call
+            model_name (str): Name reported in metrics
+            failure_rate (float): Fraction of calls that fail with a transient error
+            slow_rate (float): Fraction of calls that take slow_latency instead of latency
+            slow_latency (float): Seconds a slow call takes
+            seed (int): Seed for the injected faults, for repeatable runs
+        """
+        super().__init__(model_name)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self.calls = 0
+    
+    def _inject_faults(self):
+        """Pick this call's latency, raising a transient error for injected failures"""
+        if self._random.random() < self.failure_rate:
+            raise FakeBackendError("Injected transient failure")
+        if self._random.random() < self.slow_rate:
+            return self.slow_latency
+        return self.latency
+    
+    def _generate(self, prompt, temperature, max_output_tokens):
+        latency = self._inject_faults()
+        if latency:
+            time.sleep(latency)
+        return self._build_response(prompt)
+    
+    async def _generate_async(self, prompt, temperature, max_output_tokens):
+        latency = self._inject_faults()
+        if latency:
+            await asyncio.sleep(latency)
+        return self._build_response(prompt)
+    
+    def _stream(self, prompt, temperature, max_output_tokens, piece_size=40):
+        # Spread the injected latency over the pieces, like a real token stream
+        latency = self._inject_faults()
+        text = self._build_response(prompt)[0]
+        pieces = [text[i:i + piece_size] for i in range(0, len(text), piece_size)]
+        for piece in pieces:
+            if latency:
+                time.sleep(latency / len(pieces))
+            yield piece
+    
+    def _build_response(self, prompt):
+        """Build a JSON response with one question per sentence of the prompt text"""
+        self.calls += 1
+        
+        match = self._NUM_QUESTIONS_RE.search(prompt)
+        num_questions = int(match.group(1)) if match else 1
+        
+        content = self._TEXT_CONTENT_RE.search(prompt)
+        sentences = self._SENTENCE_RE.findall(content.group(1) if content else prompt)
+        
+        questions = []
+        for sentence in sentences[:num_questions]:
+            sentence = sentence.strip()
+            digest = hashlib.sha256(sentence.encode()).hexdigest()
+            options = [f"{letter}) Statement {digest[i * 6:(i + 1) * 6]}" for i, letter in enumerate("ABCD")]
+            options[0] = f"A) {sentence}"
+            questions.append({
+                'question': f"Which statement appears in the text ({digest[:8]})?",
+                'options': options,
+                'correct_answer': options[0],
+                'explanation': sentence
+            })
+        
+        text = json.dumps({'questions': questions})
+        return text, len(prompt) // 4, len(text) // 4
+
+# Provider name -> (backend class, API key environment variable, display name)
+BACKENDS = {
+    'gemini': (GeminiBackend, 'GOOGLE_API_KEY', 'Google'),
+    'openai': (OpenAIBackend, 'OPENAI_API_KEY', 'OpenAI'),
+    'anthropic': (AnthropicBackend, 'ANTHROPIC_API_KEY', 'Anthropic'),
+    'fake': (FakeBackend, None, 'Fake'),
+}
+
+def get_backend(provider=None, model_name=None):
+    """
+    Get the shared backend instance for a provider
+    
+    Clients are created once per (provider, model) and reused for every
+    call instead of being rebuilt per request.
+    
+    Args:
+        provider (str): One of BACKENDS, defaults to LLM_PROVIDER
+        model_name (str): Model name, defaults to LLM_MODEL for LLM_PROVIDER or the provider default
+    
+    Returns:
+        LLMBackend: Backend instance
+    
+    Raises:
+        Exception: If the provider is unknown or its API key is not set
+    """
+    provider = (provider or LLM_PROVIDER).lower()
+    if provider not in BACKENDS:
+        raise Exception(f"Unknown LLM provider '{provider}'. Choose one of: {', '.join(BACKENDS)}.")
+    
+    if not model_name and provider == LLM_PROVIDER:
+        model_name = os.environ.get("LLM_MODEL")
+    model_name = model_name or DEFAULT_MODELS[provider]
+    key = (provider, model_name)
+    
+    with _backend_lock:
+        backend = _backend_instances.get(key)
+        if backend is None:
+            backend_class, api_key_env, display_name = BACKENDS[provider]
+            if api_key_env is None:
+                backend = backend_class(model_name=model_name)
+            else:
+                api_key = os.environ.get(api_key_env)
+                if not api_key:
+                    raise Exception(f"{display_name} API key not found. Please set the {api_key_env} environment variable.")
+                backend = backend_class(api_key, model_name=model_name)
+            _backend_instances[key] = backend
+    
+    return backend
+
+def get_backend_metrics():
+    """
+    Get metrics for every backend created in this process
+    
+    Returns:
+        list: One metrics dictionary per backend instance
+    """
+    with _backend_lock:
+        backends = list(_backend_instances.values())
+    return [backend.get_metrics() for backend in backends]
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from collections import deque
+
+# HTTP status codes worth retrying: timeouts, rate limits and server-side failures
+TRANSIENT_STATUS_CODES = frozenset([408, 409, 429, 500, 502, 503, 504, 529])
+
+# Exception class name fragments used by the provider SDKs for the same conditions
+_TRANSIENT_NAME_PARTS = (
+    'timeout', 'ratelimit', 'connection', 'unavailable', 'overloaded', 'internalserver',
+    'resourceexhausted', 'deadlineexceeded', 'servererror'
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider that keeps failing"""
+
+def is_transient_error(error):
+    """
+    Decide whether a failed model call is worth retrying
+    
+    Args:
+        error (Exception): Exception raised by the provider SDK
+    
+    Returns:
+        bool: True for timeouts, connection failures, rate limits and 5xx errors
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    
+    for attribute in ('status_code', 'code', 'status'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int) and value in TRANSIENT_STATUS_CODES:
+            return True
+    
+    name = type(error).__name__.lower()
+    return any(part in name for part in _TRANSIENT_NAME_PARTS)
+
+def backoff_delay(attempt, base=0.5, maximum=8.0):
+    """
+    Seconds to wait before a retry, using exponential backoff with full jitter
+    
+    Args:
+        attempt (int): Retry number, starting at 1
+        base (float): Delay ceiling of the first retry
+        maximum (float): Upper bound for the delay ceiling
+    
+    Returns:
+        float: Random delay between 0 and min(maximum, base * 2 ** (attempt - 1))
+    """
+    return random.uniform(0, min(maximum, base * 2 ** (attempt - 1)))
+
+class CircuitBreaker:
+    """
+    Stop calling a provider after repeated transient failures
+    
+    After failure_threshold consecutive failures the circuit opens and
+    calls fail immediately; once reset_seconds have passed one trial call
+    is let through, which closes the circuit again on success.
+    """
+    
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+    
+    @property
+    def state(self):
+        """Current state: 'closed', 'open' or 'half-open'"""
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return 'half-open'
+            return 'open'
+    
+    def before_call(self):
+        """
+        Check that a call may be made
+        
+        A caller that gets True back is making the trial call and must call
+        release_trial() once it ends, however it ends.
+        
+        Returns:
+            bool: True if this call is the half-open trial call
+        
+        Raises:
+            CircuitOpenError: If the circuit is open or a trial call is already running
+        """
+        if not self.failure_threshold:
+            return False
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            
+            remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(f"Model provider is failing repeatedly; retrying in {remaining:.0f}s")
+            if self._trial_running:
+                raise CircuitOpenError("Model provider is failing repeatedly; a trial call is in progress")
+            self._trial_running = True
+            return True
+    
+    def release_trial(self):
+        """Let another trial call through after one ended without a recorded outcome, e.g. when cancelled"""
+        with self._lock:
+            self._trial_running = False
+    
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+    
+    def record_failure(self):
+        """Count a transient failure, opening the circuit at the threshold"""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+class LatencyTracker:
+    """
+    Sliding window of recent call latencies for hedging decisions
+    """
+    
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+    
+    def add(self, latency):
+        """Record the latency of a successful call in seconds"""
+        with self._lock:
+            self._latencies.append(latency)
+    
+    def percentile(self, fraction, min_samples=20):
+        """
+        Get a latency percentile over the window
+        
+        Args:
+            fraction (float): Percentile as a fraction, e.g. 0.95
+            min_samples (int): Samples needed before the estimate is trusted
+        
+        Returns:
+            float: Latency in seconds, or None with too few samples
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies or len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
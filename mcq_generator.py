@@ -1,14 +1,46 @@
+import asyncio
+import hashlib
 import json
 import os
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+from llm_backends import get_backend, run_async
+from near_duplicates import MinHashLSH, minhash_signature
+from question_stream import QuestionStreamParser, parse_partial_questions
+from chunker import chunk_document, select_chunks, estimate_tokens, CHUNK_TOKEN_BUDGET, PROMPT_CONTEXT_TOKEN_BUDGET, CHARS_PER_TOKEN
 
-# Configure Google Gemini API
-GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+# Bump whenever the prompts change so cached questions are not reused
+PROMPT_VERSION = 2
 
-def generate_mcqs(pdf_text, difficulty, num_questions, pdf_filename=None, avoid_used_questions=True):
+# Completion token limit for a single model call
+MAX_OUTPUT_TOKENS = 4000
+
+# Requests for more questions than this are split into concurrent calls
+MCQ_BATCH_SIZE = int(os.environ.get("MCQ_BATCH_SIZE", 5))
+MCQ_MAX_CONCURRENCY = int(os.environ.get("MCQ_MAX_CONCURRENCY", 4))
+
+# Background pool refill: top up to the target once unused questions drop below the low-water mark
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+POOL_TARGET_SIZE = int(os.environ.get("QUESTION_POOL_TARGET_SIZE", 20))
+POOL_LOW_WATER_MARK = int(os.environ.get("QUESTION_POOL_LOW_WATER_MARK", 10))
+
+# Batches beyond the streamed first one run here while it streams
+_batch_executor = ThreadPoolExecutor(max_workers=MCQ_MAX_CONCURRENCY, thread_name_prefix="question-batch")
+
+_pool_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="question-pool")
+_pending_refills = {}
+_pending_refills_lock = threading.Lock()
+
+def generate_mcqs(pdf_text, difficulty, num_questions, pdf_filename=None, avoid_used_questions=True,
+                  backend=None, batch_size=MCQ_BATCH_SIZE, max_concurrency=MCQ_MAX_CONCURRENCY, use_cache=True,
+                  document_key=None):
     """
-    Generate multiple choice questions from PDF text using Google Gemini
+    Generate multiple choice questions from PDF text using the configured LLM backend
+    
+    Collects everything stream_mcqs yields; see there for how the pool,
+    streaming and batching are combined.
     
     Args:
         pdf_text (str): Extracted text from PDF
@@ -16,74 +48,593 @@ def generate_mcqs(pdf_text, difficulty, num_questions, pdf_filename=None, avoid_
         num_questions (int): Number of questions to generate
         pdf_filename (str): Name of PDF file to track used questions
         avoid_used_questions (bool): Whether to avoid previously asked questions
-        
+        backend (LLMBackend): Model backend, defaults to the shared LLM_PROVIDER backend
+        batch_size (int): Maximum questions requested per model call
+        max_concurrency (int): Maximum model calls in flight at once
+        use_cache (bool): Whether to serve from and add to the question cache
+        document_key (str): Content hash of the PDF, keys the question pool and chunk coverage; defaults to a hash of pdf_text
+    
     Returns:
         list: List of MCQ dictionaries with question, options, and correct answer
     """
-    if not GOOGLE_API_KEY:
-        raise Exception("Google API key not found. Please set the GOOGLE_API_KEY environment variable.")
+    questions = list(stream_mcqs(
+        pdf_text, difficulty, num_questions, pdf_filename=pdf_filename,
+        avoid_used_questions=avoid_used_questions, backend=backend, batch_size=batch_size,
+        max_concurrency=max_concurrency, use_cache=use_cache, document_key=document_key
+    ))
+    
+    if len(questions) < num_questions:
+        st.warning(f"Only {len(questions)} out of {num_questions} questions could be generated from the PDF content.")
+    
+    return questions
+
+def stream_mcqs(pdf_text, difficulty, num_questions, pdf_filename=None, avoid_used_questions=True,
+                backend=None, batch_size=MCQ_BATCH_SIZE, max_concurrency=MCQ_MAX_CONCURRENCY, use_cache=True,
+                document_key=None, refill_pool=True):
+    """
+    Yield multiple choice questions as soon as each one is available
+    
+    Questions are served from the cached pool for this document,
+    difficulty, prompt version and model first. The pool is keyed on the
+    document, not on pdf_text, so a quiz started from the first pages of a
+    PDF shares the pool pre-generated from the whole of it. The shortfall is requested from the
+    model: the first batch is streamed and every question is yielded as
+    soon as its JSON object closes, while the remaining batches run
+    concurrently in the background and are yielded once they finish.
+    Questions served from the pool are removed from it, as are pooled
+    questions already used for this PDF. New questions that were not
+    served go to the pool, including those of a stream the caller stops
+    reading early.
     
+    Args:
+        pdf_text (str): Extracted text from PDF
+        difficulty (str): Difficulty level - "Easy", "Medium", or "Hard"
+        num_questions (int): Number of questions to generate
+        pdf_filename (str): Name of PDF file to track used questions
+        avoid_used_questions (bool): Whether to avoid previously asked questions
+        backend (LLMBackend): Model backend, defaults to the shared LLM_PROVIDER backend
+        batch_size (int): Maximum questions requested per model call
+        max_concurrency (int): Maximum model calls in flight at once
+        use_cache (bool): Whether to serve from and add to the question cache
+        document_key (str): Content hash of the PDF, keys the question pool and chunk coverage; defaults to a hash of pdf_text
+        refill_pool (bool): Whether to top up a low pool in the background; False while pdf_text is only part of the document
+    
+    Yields:
+        dict: MCQ dictionary with question, options, and correct answer
+    """
+    stats = new_generation_stats('request', pdf_filename, difficulty, num_questions)
+    cache_key = None
+    questions = []
+    new_questions = []
+    served = 0
+    served_texts = set()
     try:
-        # Configure Gemini
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        if backend is None:
+            backend = get_backend()
         
-        # Create the combined prompt
-        system_prompt = create_system_prompt(difficulty)
-        user_prompt = create_user_prompt(pdf_text, num_questions, difficulty)
+        filter_used = avoid_used_questions and pdf_filename
+        document_key = document_key or text_document_key(pdf_text)
+        cache_key = question_cache_key(document_key, difficulty, backend.model_name) if use_cache else None
         
-        full_prompt = f"{system_prompt}\n\n{user_prompt}"
+        # Serve what we can from the pre-generated pool
+        if cache_key:
+            from database import db_manager
+            
+            available = db_manager.get_cached_questions(cache_key) or []
+            if filter_used:
+                available = drop_used_pool_questions(cache_key, available, pdf_filename)
+            # Claim the questions to serve; a concurrent request gets the others
+            questions = db_manager.remove_cached_questions(cache_key, available[:num_questions])
+            stats['pool_questions'] = len(questions)
+            
+            if refill_pool and len(available) - len(questions) < POOL_LOW_WATER_MARK:
+                schedule_pool_refill(
+                    pdf_text, difficulties=(difficulty,), pdf_filename=pdf_filename,
+                    backend=backend, document_key=document_key
+                )
         
-        # Call Gemini API
-        response = model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=4000,
-            )
-        )
+        for question in questions:
+            served += 1
+            served_texts.add(question['question'])
+            yield question
         
-        # Parse the response
-        response_text = response.text
+        missing_count = num_questions - served
+        if missing_count <= 0:
+            stats['succeeded'] = True
+            return
         
-        # Extract JSON from response (Gemini might wrap it in markdown)
-        if "```json" in response_text:
-            json_start = response_text.find("```json") + 7
-            json_end = response_text.find("```", json_start)
-            response_text = response_text[json_start:json_end].strip()
-        elif "```" in response_text:
-            json_start = response_text.find("```") + 3
-            json_end = response_text.find("```", json_start)
-            response_text = response_text[json_start:json_end].strip()
+        batch_index = MinHashLSH()
         
-        result = json.loads(response_text)
+        def is_fresh(question):
+            if question['question'] in served_texts:
+                return False
+            if filter_used and not filter_used_questions([question], pdf_filename, batch_index=batch_index):
+                return False
+            served_texts.add(question['question'])
+            return True
         
-        # Validate and format the questions
-        questions = validate_and_format_questions(result.get('questions', []))
+        # Pick the streamed batch's context first so the background batches get other chunks
+        stream_count = min(missing_count, batch_size)
+        context = select_prompt_contexts(pdf_text, 1, pdf_filename=pdf_filename, document_key=document_key)[0]
         
-        # Filter out used questions if requested
-        if avoid_used_questions and pdf_filename:
-            from database import db_manager
-            used_hashes = db_manager.get_used_question_hashes(pdf_filename)
-            import hashlib
-            
-            filtered_questions = []
-            for question in questions:
-                question_hash = hashlib.md5(question['question'].encode()).hexdigest()
-                if question_hash not in used_hashes:
-                    filtered_questions.append(question)
-            
-            questions = filtered_questions
+        remaining_future = None
+        remaining_stats = new_generation_stats('request', pdf_filename, difficulty, 0)
+        if missing_count > stream_count:
+            remaining_future = _batch_executor.submit(
+                request_mcqs, pdf_text, difficulty, missing_count - stream_count, backend,
+                pdf_filename=pdf_filename, batch_size=batch_size, max_concurrency=max_concurrency,
+                stats=remaining_stats, document_key=document_key
+            )
         
-        if len(questions) < num_questions:
-            st.warning(f"Only {len(questions)} out of {num_questions} questions could be generated from the PDF content.")
+        errors = []
+        full_prompt = f"{create_system_prompt(difficulty)}\n\n{create_user_prompt(context, stream_count, difficulty)}"
+        parser = QuestionStreamParser()
+        streamed_questions = []
+        completion_length = 0
+        try:
+            for piece in backend.stream(full_prompt, temperature=0.7, max_output_tokens=MAX_OUTPUT_TOKENS, stats=stats):
+                completion_length += len(piece)
+                for question in validate_and_format_questions(parser.feed(piece)):
+                    streamed_questions.append(question)
+                    new_questions.append(question)
+                    if served < num_questions and is_fresh(question):
+                        served += 1
+                        yield question
+        except Exception as e:
+            errors.append(e)
+        add_call_usage(
+            stats, full_prompt, 0, -(-completion_length // CHARS_PER_TOKEN), stream_count, len(streamed_questions)
+        )
         
-        return questions
+        if remaining_future is not None:
+            try:
+                remaining_questions = remaining_future.result()
+            except Exception as e:
+                errors.append(e)
+                remaining_questions = []
+            finally:
+                for key in ('model_calls', 'prompt_chars', 'prompt_tokens', 'completion_tokens',
+                            'model_requested_questions', 'validated_questions', 'retries'):
+                    stats[key] += remaining_stats[key]
+            
+            new_questions.extend(remaining_questions)
+            for question in remaining_questions:
+                if served < num_questions and is_fresh(question):
+                    served += 1
+                    yield question
         
+        if errors and not new_questions:
+            raise errors[0]
+        
+        stats['succeeded'] = True
+    
     except json.JSONDecodeError as e:
         raise Exception(f"Failed to parse AI response: {str(e)}")
     except Exception as e:
         raise Exception(f"Failed to generate questions: {str(e)}")
+    finally:
+        # Return claimed questions the caller did not read and pool the unserved new ones
+        unserved_questions = [q for q in questions + new_questions if q['question'] not in served_texts]
+        if cache_key and unserved_questions:
+            from database import db_manager
+            db_manager.add_cached_questions(
+                cache_key, unserved_questions, model_name=backend.model_name, difficulty=difficulty
+            )
+        stats['returned_questions'] = served
+        record_generation_stats(stats, backend)
+
+def new_generation_stats(source, pdf_filename, difficulty, num_questions):
+    """
+    Start the metrics record for one generation request
+    
+    Args:
+        source (str): "request" for user requests, "refill" for background pool refills
+        pdf_filename (str): Name of PDF file
+        difficulty (str): Difficulty level
+        num_questions (int): Number of questions asked for
+    
+    Returns:
+        dict: Counters filled in while the request runs
+    """
+    return {
+        'source': source,
+        'pdf_filename': pdf_filename,
+        'difficulty': difficulty,
+        'requested_questions': num_questions,
+        'pool_questions': 0,
+        'model_requested_questions': 0,
+        'validated_questions': 0,
+        'returned_questions': 0,
+        'model_calls': 0,
+        'prompt_chars': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'retries': 0,
+        'succeeded': False,
+        'started_at': time.perf_counter()
+    }
+
+def add_call_usage(stats, prompt, prompt_tokens, completion_tokens, requested, validated):
+    """Add one model call to a generation metrics record"""
+    if stats is None:
+        return
+    stats['model_calls'] += 1
+    stats['prompt_chars'] += len(prompt)
+    # Fall back to an estimate when the provider does not report usage
+    stats['prompt_tokens'] += prompt_tokens or estimate_tokens(prompt)
+    stats['completion_tokens'] += completion_tokens
+    stats['model_requested_questions'] += requested
+    stats['validated_questions'] += validated
+
+def record_generation_stats(stats, backend=None):
+    """Store a finished generation metrics record"""
+    from database import db_manager
+    
+    record = dict(stats)
+    record['latency_seconds'] = time.perf_counter() - record.pop('started_at')
+    record['provider'] = getattr(backend, 'name', None)
+    record['model_name'] = getattr(backend, 'model_name', None)
+    db_manager.save_generation_metric(record)
+
+def schedule_pool_refill(pdf_text, difficulties=DIFFICULTIES, pdf_filename=None, backend=None, document_key=None):
+    """
+    Start filling the question pools for a document in the background
+    
+    At most one refill per pool runs at a time; pools already being filled
+    are skipped.
+    
+    Args:
+        pdf_text (str): Extracted text from PDF
+        difficulties (tuple): Difficulty levels to fill
+        pdf_filename (str): Name of PDF file, used to skip already used questions
+        backend (LLMBackend): Model backend, defaults to the shared LLM_PROVIDER backend
+        document_key (str): Content hash of the PDF, keys the question pool and chunk coverage; defaults to a hash of pdf_text
+    
+    Returns:
+        list: Futures of the refills started
+    """
+    if backend is None:
+        backend = get_backend()
+    document_key = document_key or text_document_key(pdf_text)
+    
+    futures = []
+    with _pending_refills_lock:
+        for difficulty in difficulties:
+            cache_key = question_cache_key(document_key, difficulty, backend.model_name)
+            if cache_key in _pending_refills:
+                continue
+            
+            future = _pool_executor.submit(
+                refill_question_pool, pdf_text, difficulty, pdf_filename=pdf_filename,
+                backend=backend, document_key=document_key
+            )
+            _pending_refills[cache_key] = future
+            future.add_done_callback(lambda _, key=cache_key: _pending_refills.pop(key, None))
+            futures.append(future)
+    
+    return futures
+
+def refill_question_pool(pdf_text, difficulty, pdf_filename=None, backend=None, target_size=POOL_TARGET_SIZE,
+                         document_key=None):
+    """
+    Top up the question pool for a document and difficulty to the target size
+    
+    Args:
+        pdf_text (str): Extracted text from PDF
+        difficulty (str): Difficulty level - "Easy", "Medium", or "Hard"
+        pdf_filename (str): Name of PDF file, used to skip already used questions
+        backend (LLMBackend): Model backend, defaults to the shared LLM_PROVIDER backend
+        target_size (int): Number of unused questions to keep in the pool
+        document_key (str): Content hash of the PDF, keys the question pool and chunk coverage; defaults to a hash of pdf_text
+    
+    Returns:
+        int: Number of questions added to the pool
+    """
+    from database import db_manager
+    
+    stats = None
+    try:
+        if backend is None:
+            backend = get_backend()
+        document_key = document_key or text_document_key(pdf_text)
+        cache_key = question_cache_key(document_key, difficulty, backend.model_name)
+        
+        available = db_manager.get_cached_questions(cache_key) or []
+        if pdf_filename:
+            available = drop_used_pool_questions(cache_key, available, pdf_filename)
+        
+        missing_count = target_size - len(available)
+        if missing_count <= 0:
+            return 0
+        
+        stats = new_generation_stats('refill', pdf_filename, difficulty, missing_count)
+        new_questions = request_mcqs(pdf_text, difficulty, missing_count, backend, pdf_filename=pdf_filename,
+                                     stats=stats, document_key=document_key)
+        if new_questions:
+            db_manager.add_cached_questions(
+                cache_key, new_questions, model_name=backend.model_name, difficulty=difficulty
+            )
+        stats['returned_questions'] = len(new_questions)
+        stats['succeeded'] = True
+        return len(new_questions)
+    
+    except Exception as e:
+        print(f"Error refilling question pool: {str(e)}")
+        return 0
+    finally:
+        if stats is not None:
+            record_generation_stats(stats, backend)
+
+def request_mcqs(pdf_text, difficulty, num_questions, backend, pdf_filename=None,
+                 batch_size=MCQ_BATCH_SIZE, max_concurrency=MCQ_MAX_CONCURRENCY, stats=None, document_key=None):
+    """
+    Request questions from the model, batching large requests
+    
+    Args:
+        pdf_text (str): Extracted text from PDF
+        difficulty (str): Difficulty level - "Easy", "Medium", or "Hard"
+        num_questions (int): Number of questions to generate
+        backend (LLMBackend): Model backend
+        pdf_filename (str): Name of PDF file, recorded with chunk coverage
+        batch_size (int): Maximum questions requested per model call
+        max_concurrency (int): Maximum model calls in flight at once
+        stats (dict): Generation metrics record to add model calls to
+        document_key (str): Content hash of the PDF, keys the question pool and chunk coverage; defaults to a hash of pdf_text
+    
+    Returns:
+        list: Validated questions
+    """
+    if num_questions > batch_size:
+        # The shared loop keeps the backends' async clients on the loop they were first used on
+        return run_async(generate_mcqs_batched(
+            pdf_text, difficulty, num_questions, backend, pdf_filename=pdf_filename,
+            batch_size=batch_size, max_concurrency=max_concurrency, stats=stats, document_key=document_key
+        ))
+    
+    # Create the combined prompt
+    context = select_prompt_contexts(pdf_text, 1, pdf_filename=pdf_filename, document_key=document_key)[0]
+    system_prompt = create_system_prompt(difficulty)
+    user_prompt = create_user_prompt(context, num_questions, difficulty)
+    
+    full_prompt = f"{system_prompt}\n\n{user_prompt}"
+    
+    response_text, prompt_tokens, completion_tokens = backend.generate_with_usage(
+        full_prompt, temperature=0.7, max_output_tokens=MAX_OUTPUT_TOKENS, stats=stats
+    )
+    questions = parse_mcq_response(response_text)
+    add_call_usage(stats, full_prompt, prompt_tokens, completion_tokens, num_questions, len(questions))
+    return questions
+
+def select_prompt_contexts(pdf_text, num_prompts, pdf_filename=None, document_key=None):
+    """
+    Choose the document text to send with each prompt
+    
+    The document is split into token-budgeted chunks and each prompt gets
+    the chunks sent least often so far for this document; the choice is
+    recorded so the next quiz moves on to uncovered parts.
+    
+    Args:
+        pdf_text (str): Extracted text from PDF
+        num_prompts (int): Number of prompts to fill
+        pdf_filename (str): Name of PDF file, recorded with the coverage counts
+        document_key (str): Content hash of the PDF, keys the question pool and chunk coverage; defaults to a hash of pdf_text
+    
+    Returns:
+        list: Context text for each prompt
+    """
+    from database import db_manager
+    
+    chunks = chunk_document(pdf_text)
+    if not chunks:
+        return [pdf_text] * num_prompts
+    
+    document_key = document_key or text_document_key(pdf_text)
+    coverage = db_manager.get_chunk_coverage(document_key, len(chunks))
+    selections = select_chunks(
+        coverage,
+        num_prompts=num_prompts,
+        chunks_per_prompt=max(1, PROMPT_CONTEXT_TOKEN_BUDGET // CHUNK_TOKEN_BUDGET)
+    )
+    db_manager.record_chunk_coverage(
+        document_key,
+        [index for selection in selections for index in selection],
+        pdf_filename=pdf_filename
+    )
+    
+    return ['\n\n'.join(chunks[index] for index in selection) for selection in selections]
+
+def question_cache_key(document_key, difficulty, model_name):
+    """
+    Build the question cache key for a document, difficulty and model
+    
+    The question count is deliberately left out so a cached pool can serve
+    requests of any size.
+    
+    Args:
+        document_key (str): Content hash of the PDF, or text_document_key() of its text
+        difficulty (str): Difficulty level
+        model_name (str): Model used to generate the questions
+    
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(f"{PROMPT_VERSION}\0{model_name}\0{difficulty}\0{document_key}".encode()).hexdigest()
+
+def text_document_key(pdf_text):
+    """
+    Build a document key from extracted text, for callers without the PDF's content hash
+    
+    Args:
+        pdf_text (str): Extracted text from PDF
+    
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(pdf_text.encode()).hexdigest()
+
+def filter_used_questions(questions, pdf_filename, batch_index=None):
+    """
+    Drop questions that were already asked for this PDF
+    
+    Exact repeats are found by hash; rephrasings of a used question (or of
+    an earlier question in the same list) by MinHash/LSH similarity of the
+    question and its answer.
+    
+    Args:
+        questions (list): Question dictionaries
+        pdf_filename (str): Name of PDF file the questions were used for
+        batch_index (MinHashLSH): Index of questions already accepted, shared between calls
+    
+    Returns:
+        list: Questions not yet used
+    """
+    from database import db_manager, hash_question_text
+    question_hashes = [hash_question_text(question['question']) for question in questions]
+    used_hashes = db_manager.find_used_question_hashes(pdf_filename, question_hashes)
+    questions = [
+        question for question, question_hash in zip(questions, question_hashes)
+        if question_hash not in used_hashes
+    ]
+    
+    signatures = [minhash_signature(q['question'], q.get('correct_answer', '')) for q in questions]
+    near_duplicates = db_manager.find_near_duplicate_positions(pdf_filename, signatures)
+    
+    if batch_index is None:
+        batch_index = MinHashLSH()
+    filtered_questions = []
+    for position, (question, signature) in enumerate(zip(questions, signatures)):
+        if position in near_duplicates or batch_index.query(signature):
+            continue
+        batch_index.add(signature)
+        filtered_questions.append(question)
+    
+    return filtered_questions
+
+def drop_used_pool_questions(cache_key, questions, pdf_filename):
+    """
+    Remove pooled questions already used for this PDF from the pool
+    
+    Keeps the pool, and the MinHash work of filtering it, limited to
+    questions that can still be served.
+    
+    Args:
+        cache_key (str): Question pool key
+        questions (list): Questions read from the pool
+        pdf_filename (str): Name of PDF file the questions were used for
+    
+    Returns:
+        list: Questions not yet used
+    """
+    from database import db_manager
+    fresh_questions = filter_used_questions(questions, pdf_filename)
+    fresh_ids = {id(question) for question in fresh_questions}
+    db_manager.remove_cached_questions(cache_key, [q for q in questions if id(q) not in fresh_ids])
+    return fresh_questions
+
+async def generate_mcqs_batched(pdf_text, difficulty, num_questions, backend, pdf_filename=None,
+                                batch_size=MCQ_BATCH_SIZE, max_concurrency=MCQ_MAX_CONCURRENCY, stats=None,
+                                document_key=None):
+    """
+    Generate questions with several concurrent model calls
+    
+    Each call gets different least-covered chunks of the document so the
+    batches ask about different content; results are merged in batch order.
+    
+    Args:
+        pdf_text (str): Extracted text from PDF
+        difficulty (str): Difficulty level - "Easy", "Medium", or "Hard"
+        num_questions (int): Total number of questions to generate
+        backend (LLMBackend): Model backend
+        pdf_filename (str): Name of PDF file, recorded with chunk coverage
+        batch_size (int): Maximum questions requested per model call
+        max_concurrency (int): Maximum model calls in flight at once
+        stats (dict): Generation metrics record to add model calls to
+        document_key (str): Content hash of the PDF, keys the question pool and chunk coverage; defaults to a hash of pdf_text
+    
+    Returns:
+        list: Validated questions, at most num_questions
+    
+    Raises:
+        Exception: If every batch fails
+    """
+    num_batches = -(-num_questions // batch_size)
+    batch_counts = [batch_size] * (num_batches - 1) + [num_questions - batch_size * (num_batches - 1)]
+    contexts = select_prompt_contexts(pdf_text, num_batches, pdf_filename=pdf_filename, document_key=document_key)
+    system_prompt = create_system_prompt(difficulty)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run_batch(context, batch_count):
+        full_prompt = f"{system_prompt}\n\n{create_user_prompt(context, batch_count, difficulty)}"
+        async with semaphore:
+            response_text, prompt_tokens, completion_tokens = await backend.generate_with_usage_async(
+                full_prompt,
+                temperature=0.7,
+                max_output_tokens=MAX_OUTPUT_TOKENS,
+                stats=stats
+            )
+        questions = parse_mcq_response(response_text)
+        add_call_usage(stats, full_prompt, prompt_tokens, completion_tokens, batch_count, len(questions))
+        return questions
+    
+    results = await asyncio.gather(
+        *(run_batch(context, count) for context, count in zip(contexts, batch_counts)),
+        return_exceptions=True
+    )
+    
+    questions = []
+    seen_questions = set()
+    errors = []
+    for result in results:
+        if isinstance(result, Exception):
+            errors.append(result)
+            continue
+        for question in result:
+            key = question['question'].lower()
+            if key not in seen_questions:
+                seen_questions.add(key)
+                questions.append(question)
+    
+    if errors and not questions:
+        raise errors[0]
+    
+    return questions[:num_questions]
+
+def parse_mcq_response(response_text):
+    """
+    Parse and validate the JSON question list returned by the model
+    
+    Args:
+        response_text (str): Raw model response
+    
+    Returns:
+        list: Validated questions
+    
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON and holds no complete question
+    """
+    raw_response = response_text
+    
+    # Extract JSON from response (Gemini might wrap it in markdown)
+    if "```json" in response_text:
+        json_start = response_text.find("```json") + 7
+        json_end = response_text.find("```", json_start)
+        response_text = response_text[json_start:json_end].strip()
+    elif "```" in response_text:
+        json_start = response_text.find("```") + 3
+        json_end = response_text.find("```", json_start)
+        response_text = response_text[json_start:json_end].strip()
+    
+    try:
+        result = json.loads(response_text)
+    except json.JSONDecodeError:
+        # A truncated response still holds every question that closed before the cut
+        recovered = parse_partial_questions(raw_response)
+        if not recovered:
+            raise
+        return validate_and_format_questions(recovered)
+    
+    # Validate and format the questions
+    return validate_and_format_questions(result.get('questions', []))
 
 def create_system_prompt(difficulty):
     """Create system prompt based on difficulty level"""
@@ -98,7 +649,7 @@ IMPORTANT RULES:
 5. Incorrect options should be plausible but clearly wrong
 6. Questions should be clear, unambiguous, and grammatically correct
 7. Avoid overly obvious answers or trick questions"""
-
+    
     difficulty_specific = {
         "Easy": """
 DIFFICULTY: EASY
@@ -130,19 +681,8 @@ DIFFICULTY: HARD
 def create_user_prompt(pdf_text, num_questions, difficulty):
     """Create user prompt with PDF content and requirements"""
     
-    # Shuffle text content to get questions from different parts
-    import random
-    
-    # Split text into chunks and randomly select from different parts
-    sentences = pdf_text.split('.')
-    if len(sentences) > 20:
-        # Take random sections from the text to ensure variety
-        random.shuffle(sentences)
-        selected_sentences = sentences[:min(len(sentences), 50)]
-        pdf_text = '. '.join(selected_sentences)
-    
-    # Truncate text if too long (to avoid token limits)
-    max_text_length = 8000  # Adjust based on model limits
+    # Truncate text if too long (callers normally pass a chunk selection already within budget)
+    max_text_length = PROMPT_CONTEXT_TOKEN_BUDGET * CHARS_PER_TOKEN
     if len(pdf_text) > max_text_length:
         pdf_text = pdf_text[:max_text_length] + "..."
     
@@ -180,7 +720,7 @@ def validate_and_format_questions(questions):
     
     Args:
         questions (list): Raw questions from AI response
-        
+    
     Returns:
         list: Validated and formatted questions
     """
@@ -227,29 +767,29 @@ def validate_and_format_questions(questions):
             }
             
             validated_questions.append(formatted_question)
-            
+        
         except Exception as e:
             # Skip invalid questions
             continue
     
     return validated_questions
 
-def test_gemini_connection():
-    """Test if Google Gemini API is accessible"""
+def test_backend_connection(provider=None):
+    """Test if the configured LLM provider is accessible"""
     try:
-        if not GOOGLE_API_KEY:
-            return False, "Google API key not found"
-        
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        backend = get_backend(provider)
         
         # Simple test call
-        response = model.generate_content("Hello")
-        
-        return True, "Google Gemini API connection successful"
+        backend.generate("Hello", max_output_tokens=16)
         
+        return True, f"{backend.name} ({backend.model_name}) connection successful"
+    
     except Exception as e:
-        return False, f"Google Gemini API connection failed: {str(e)}"
+        return False, f"LLM connection failed: {str(e)}"
+
+def test_gemini_connection():
+    """Test if Google Gemini API is accessible"""
+    return test_backend_connection('gemini')
 
 def estimate_question_generation_time(text_length, num_questions):
     """
@@ -258,7 +798,7 @@ def estimate_question_generation_time(text_length, num_questions):
     Args:
         text_length (int): Length of the PDF text
         num_questions (int): Number of questions to generate
-        
+    
     Returns:
         int: Estimated time in seconds
     """
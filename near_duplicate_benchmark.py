@@ -0,0 +1,100 @@
+"""
+Measure near-duplicate lookup time as a PDF accumulates used questions
+
+Fills a scratch database with used questions for one PDF and times how
+long find_near_duplicate_positions takes to check a batch of candidates,
+half of them rephrasings of used questions and half new. A full scan
+over every stored signature is timed alongside for comparison.
+
+Usage:
+    python near_duplicate_benchmark.py [--url DATABASE_URL] [--sizes 1000 10000 50000] [--candidates N]
+"""
+import argparse
+import random
+import time
+
+from database import DatabaseManager, UsedQuestion, UsedQuestionBand
+from near_duplicates import minhash_signature, unpack_signature, estimate_similarity, NEAR_DUPLICATE_THRESHOLD
+
+BENCHMARK_FILENAME = "near_duplicate_benchmark.pdf"
+INSERT_BATCH_SIZE = 1000
+
+def build_fact(rng, vocabulary):
+    """Pick the content words of one question: two subject words, two object words and a two word answer"""
+    return [rng.choice(vocabulary) for _ in range(6)]
+
+def asked_question(fact):
+    """The question as it was first asked"""
+    return {
+        'question': f"What is the role of {fact[0]} {fact[1]} in {fact[2]} {fact[3]}?",
+        'correct_answer': f"A) {fact[4]} {fact[5]}"
+    }
+
+def rephrased_question(fact):
+    """The same question as the model rewords it in a later quiz"""
+    return {
+        'question': f"Which of the following best describes the role of {fact[0]} {fact[1]} in {fact[2]} {fact[3]}?",
+        'correct_answer': f"C) {fact[4]} {fact[5]}"
+    }
+
+def linear_scan(manager, signatures):
+    """Compare every candidate with every stored signature of the benchmark PDF"""
+    with manager.session_scope() as session:
+        stored = [
+            unpack_signature(row.minhash_signature)
+            for row in session.query(UsedQuestion.minhash_signature).filter_by(pdf_filename=BENCHMARK_FILENAME)
+        ]
+    return {
+        position for position, signature in enumerate(signatures)
+        if any(estimate_similarity(signature, other) >= NEAR_DUPLICATE_THRESHOLD for other in stored)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate question lookup")
+    parser.add_argument('--url', default="sqlite:///near_duplicate_benchmark.db",
+                        help="Scratch database URL, defaults to sqlite:///near_duplicate_benchmark.db")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help="Used question counts to measure at")
+    parser.add_argument('--candidates', type=int, default=20, help="Candidate questions checked per lookup")
+    args = parser.parse_args()
+    
+    manager = DatabaseManager(args.url)
+    with manager.session_scope() as session:
+        session.query(UsedQuestionBand).filter_by(pdf_filename=BENCHMARK_FILENAME).delete()
+        session.query(UsedQuestion).filter_by(pdf_filename=BENCHMARK_FILENAME).delete()
+    
+    rng = random.Random(13)
+    vocabulary = [
+        ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 10)))
+        for _ in range(3000)
+    ]
+    facts = []
+    
+    print(f"{'used':>7}  {'LSH ms':>7}  {'scan ms':>8}  {'rephrasings found':>17}  {'new flagged':>11}")
+    for size in sorted(args.sizes):
+        while len(facts) < size:
+            batch = [build_fact(rng, vocabulary) for _ in range(min(INSERT_BATCH_SIZE, size - len(facts)))]
+            manager.mark_questions_as_used(BENCHMARK_FILENAME, [asked_question(fact) for fact in batch])
+            facts.extend(batch)
+        
+        repeats = [rephrased_question(fact) for fact in rng.sample(facts, args.candidates // 2)]
+        fresh = [asked_question(build_fact(rng, vocabulary)) for _ in range(args.candidates - len(repeats))]
+        signatures = [minhash_signature(q['question'], q['correct_answer']) for q in repeats + fresh]
+        
+        start = time.perf_counter()
+        duplicates = manager.find_near_duplicate_positions(BENCHMARK_FILENAME, signatures)
+        lookup_seconds = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        scanned = linear_scan(manager, signatures)
+        scan_seconds = time.perf_counter() - start
+        if scanned != duplicates:
+            print(f"  LSH and full scan disagree on {len(scanned ^ duplicates)} candidates")
+        
+        found = sum(1 for position in duplicates if position < len(repeats))
+        flagged = len(duplicates) - found
+        print(f"{size:>7}  {lookup_seconds * 1000:>7.1f}  {scan_seconds * 1000:>8.1f}  "
+              f"{found:>8}/{len(repeats):<8}  {flagged:>5}/{len(fresh):<5}")
+
+if __name__ == "__main__":
+    main()
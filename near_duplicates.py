@@ -0,0 +1,161 @@
+import re
+import random
+import hashlib
+from array import array
+
+# MinHash signature length, split into LSH bands of BAND_ROWS values each
+NUM_PERMUTATIONS = 64
+BAND_ROWS = 4
+NUM_BANDS = NUM_PERMUTATIONS // BAND_ROWS
+
+# Estimated Jaccard similarity at or above which two questions count as the same
+NEAR_DUPLICATE_THRESHOLD = 0.5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+
+# Fixed seed so signatures stay comparable across processes and restarts
+_rng = random.Random(1337)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+_TOKEN_RE = re.compile(r'\w+')
+_OPTION_PREFIX_RE = re.compile(r'^[A-Da-d][).:]\s*')
+
+# Question phrasing words that differ between rewordings of the same question
+_STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'best', 'by', 'correct', 'define', 'defines',
+    'describe', 'describes', 'does', 'following', 'for', 'from', 'how', 'in', 'is', 'it',
+    'main', 'most', 'of', 'on', 'or', 'primary', 'statement', 'text', 'that', 'the', 'this',
+    'to', 'true', 'was', 'what', 'when', 'where', 'which', 'who', 'why', 'with'
+])
+
+def question_shingles(question_text, answer_text=''):
+    """
+    Build the shingle set for a question and its correct answer
+    
+    Content words are used as unigrams and adjacent pairs, so a rephrased
+    question about the same fact with the same answer shares most shingles.
+    
+    Args:
+        question_text (str): Question text
+        answer_text (str): Correct answer, with or without its "A)" prefix
+    
+    Returns:
+        set: Shingle strings
+    """
+    answer_text = _OPTION_PREFIX_RE.sub('', answer_text or '')
+    tokens = [
+        token for token in _TOKEN_RE.findall(f"{question_text} {answer_text}".lower())
+        if token not in _STOPWORDS
+    ]
+    shingles = set(tokens)
+    shingles.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    return shingles
+
+def minhash_signature(question_text, answer_text=''):
+    """
+    Compute the MinHash signature of a question
+    
+    Args:
+        question_text (str): Question text
+        answer_text (str): Correct answer
+    
+    Returns:
+        list: NUM_PERMUTATIONS integers
+    """
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for shingle in question_shingles(question_text, answer_text)
+    ]
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERMUTATIONS
+    
+    return [
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+def band_keys(signature):
+    """
+    Split a signature into LSH band keys
+    
+    Two questions become candidates when they share any band key.
+    
+    Args:
+        signature (list): MinHash signature
+    
+    Returns:
+        list: NUM_BANDS hex strings, each prefixed with its band number
+    """
+    keys = []
+    for band in range(NUM_BANDS):
+        rows = array('Q', signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]).tobytes()
+        keys.append(f"{band:02d}{hashlib.md5(rows).hexdigest()[:14]}")
+    return keys
+
+def estimate_similarity(signature_a, signature_b):
+    """
+    Estimate the Jaccard similarity of two questions from their signatures
+    
+    Args:
+        signature_a (list): MinHash signature
+        signature_b (list): MinHash signature
+    
+    Returns:
+        float: Fraction of matching signature values
+    """
+    matches = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+    return matches / NUM_PERMUTATIONS
+
+def pack_signature(signature):
+    """Serialize a signature for storage"""
+    return array('Q', signature).tobytes()
+
+def unpack_signature(data):
+    """Deserialize a signature produced by pack_signature"""
+    signature = array('Q')
+    signature.frombytes(data)
+    return signature.tolist()
+
+class MinHashLSH:
+    """
+    In-memory LSH index for near-duplicate lookups within a batch of questions
+    """
+    
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.signatures = []
+        self.buckets = {}
+    
+    def query(self, signature):
+        """
+        Check whether a near duplicate of a signature has been added
+        
+        Args:
+            signature (list): MinHash signature
+        
+        Returns:
+            bool: True if an added signature is at least threshold similar
+        """
+        candidates = set()
+        for key in band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+        return any(
+            estimate_similarity(signature, self.signatures[i]) >= self.threshold
+            for i in candidates
+        )
+    
+    def add(self, signature):
+        """
+        Add a signature to the index
+        
+        Args:
+            signature (list): MinHash signature
+        """
+        position = len(self.signatures)
+        self.signatures.append(signature)
+        for key in band_keys(signature):
+            self.buckets.setdefault(key, []).append(position)
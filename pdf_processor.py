@@ -1,77 +1,319 @@
 import PyPDF2
 import io
+import os
+import re
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import streamlit as st
 
-def extract_text_from_pdf(uploaded_file):
+# Number of worker processes used for page extraction (1 disables the pool)
+PDF_EXTRACTION_WORKERS = int(os.environ.get("PDF_EXTRACTION_WORKERS", os.cpu_count() or 1))
+
+# Documents with fewer pages than this are extracted in-process
+PARALLEL_EXTRACTION_MIN_PAGES = 32
+
+# Separator kept between pages in extracted text (form feed, as in pdftotext output)
+PAGE_BREAK = "\f"
+
+# A blank line: two line breaks with only whitespace between them
+_BLANK_LINE_RE = re.compile(r'\n\s*\n')
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_CHAR_RE = re.compile(r'\s')
+_SENTENCE_END_RE = re.compile(r'[.!?]+')
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\n|\f')
+
+# Extraction process pools by worker count, shared by all uploads. Workers are
+# spawned rather than forked, since forking the multi-threaded Streamlit server is unsafe
+_extraction_executors = {}
+_extraction_executors_lock = threading.Lock()
+
+# Hit/miss counters for the content-addressed extraction cache in this process;
+# DatabaseManager.get_extraction_cache_stats has the totals across processes
+_extraction_cache_stats = {'hits': 0, 'misses': 0}
+_extraction_cache_stats_lock = threading.Lock()
+
+def extract_text_from_pdf(uploaded_file, use_cache=True, workers=None):
     """
     Extract text content from uploaded PDF file
     
+    Repeat uploads of the same file are served from a persistent cache keyed
+    by the SHA-256 of the PDF bytes, skipping PyPDF2 entirely.
+    
     Args:
         uploaded_file: Streamlit uploaded file object
-        
+        use_cache (bool): Whether to read from and write to the extraction cache
+        workers (int): Worker processes for page extraction, defaults to PDF_EXTRACTION_WORKERS
+    
     Returns:
         str: Extracted text content from the PDF
-        
+    
     Raises:
         Exception: If PDF processing fails
     """
     try:
+        pdf_bytes = read_pdf_bytes(uploaded_file)
+        content_hash = pdf_content_hash(pdf_bytes)
+        
+        if use_cache:
+            from database import db_manager
+            cached = db_manager.get_cached_extraction(content_hash)
+            _count_extraction_cache_lookup(cached is not None)
+            if cached is not None:
+                return cached['text']
+        
         # Read the uploaded file
-        pdf_reader = PyPDF2.PdfReader(uploaded_file)
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
         
         # Check if PDF is encrypted
         if pdf_reader.is_encrypted:
             raise Exception("The PDF is password protected. Please upload an unprotected PDF.")
         
-        # Extract text from all pages
-        text_content = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            page_text = page.extract_text()
-            
-            if page_text:
-                text_content += page_text + "\n"
+        # Extract text from all pages; pages without text are kept so page numbers stay right
+        page_texts = extract_page_texts(pdf_bytes, pdf_reader, workers)
         
         # Clean up the text
-        text_content = clean_extracted_text(text_content)
+        text_content = clean_extracted_text(PAGE_BREAK.join(page_texts))
         
         if not text_content.strip():
             raise Exception("No readable text found in the PDF. The PDF might contain only images or scanned content.")
         
+        if use_cache:
+            db_manager.save_cached_extraction(
+                content_hash,
+                text_content,
+                [clean_extracted_text(page_text) for page_text in page_texts]
+            )
+        
         return text_content
+    
+    except Exception as e:
+        raise Exception(f"Failed to process PDF: {str(e)}")
+
+def iter_pdf_pages(uploaded_file, use_cache=True, workers=None):
+    """
+    Extract cleaned page text one page at a time
+    
+    Lets callers report progress and start working on the first pages before
+    the whole document has been read. Large documents are extracted by the
+    process pool, with pages still produced in order. Once every page has
+    been produced the result is written to the extraction cache; cached
+    documents are replayed without touching PyPDF2.
+    
+    Args:
+        uploaded_file: Streamlit uploaded file object
+        use_cache (bool): Whether to read from and write to the extraction cache
+        workers (int): Worker processes for page extraction, defaults to PDF_EXTRACTION_WORKERS
+    
+    Yields:
+        tuple: (page_number, page_count, cleaned_page_text), page_number starting at 1
+    
+    Raises:
+        Exception: If PDF processing fails
+    """
+    try:
+        pdf_bytes = read_pdf_bytes(uploaded_file)
+        content_hash = pdf_content_hash(pdf_bytes)
         
+        if use_cache:
+            from database import db_manager
+            cached = db_manager.get_cached_extraction(content_hash)
+            _count_extraction_cache_lookup(cached is not None)
+            if cached is not None:
+                page_count = len(cached['pages'])
+                for page_num, page_text in enumerate(cached['pages'], start=1):
+                    yield page_num, page_count, page_text
+                return
+        
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        if pdf_reader.is_encrypted:
+            raise Exception("The PDF is password protected. Please upload an unprotected PDF.")
+        
+        page_count = len(pdf_reader.pages)
+        page_texts = []
+        for page_num, raw_text in enumerate(iter_page_texts(pdf_bytes, pdf_reader, workers), start=1):
+            page_text = clean_extracted_text(raw_text)
+            page_texts.append(page_text)
+            yield page_num, page_count, page_text
+        
+        text_content = clean_extracted_text(PAGE_BREAK.join(page_texts))
+        if use_cache and text_content.strip():
+            db_manager.save_cached_extraction(content_hash, text_content, page_texts)
+    
     except Exception as e:
         raise Exception(f"Failed to process PDF: {str(e)}")
 
+def min_text_length_for_questions(num_questions, chars_per_question=500, min_length=100):
+    """
+    Estimate how much extracted text is needed before generating questions
+    
+    Args:
+        num_questions (int): Number of questions requested
+        chars_per_question (int): Characters of source text per question
+        min_length (int): Lower bound matching validate_pdf_content
+    
+    Returns:
+        int: Minimum number of characters to buffer
+    """
+    return max(min_length, num_questions * chars_per_question)
+
+def extract_page_texts(pdf_bytes, pdf_reader=None, workers=None):
+    """
+    Extract raw text for every page, splitting large documents across processes
+    
+    Args:
+        pdf_bytes (bytes): PDF file content
+        pdf_reader: Already opened reader over pdf_bytes, if available
+        workers (int): Worker processes, defaults to PDF_EXTRACTION_WORKERS
+    
+    Returns:
+        list: Raw text of each page, empty string for pages without text
+    """
+    return list(iter_page_texts(pdf_bytes, pdf_reader, workers))
+
+def iter_page_texts(pdf_bytes, pdf_reader=None, workers=None):
+    """
+    Yield raw text for every page in order, splitting large documents across processes
+    
+    The pages are split into one contiguous range per worker, since every
+    range has to parse the whole file again. The first range is extracted
+    here page by page, so the first pages are yielded while worker
+    processes extract the other ranges.
+    
+    Args:
+        pdf_bytes (bytes): PDF file content
+        pdf_reader: Already opened reader over pdf_bytes, if available
+        workers (int): Worker processes, defaults to PDF_EXTRACTION_WORKERS
+    
+    Yields:
+        str: Raw text of each page, empty string for pages without text
+    """
+    if pdf_reader is None:
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    
+    page_count = len(pdf_reader.pages)
+    workers = max(1, min(workers or PDF_EXTRACTION_WORKERS, page_count))
+    
+    if workers == 1 or page_count < PARALLEL_EXTRACTION_MIN_PAGES:
+        for page in pdf_reader.pages:
+            yield page.extract_text() or ""
+        return
+    
+    step = -(-page_count // workers)
+    executor = _get_extraction_executor(workers - 1)
+    futures = [
+        executor.submit(_extract_page_range, pdf_bytes, start, min(start + step, page_count))
+        for start in range(step, page_count, step)
+    ]
+    try:
+        for page_num in range(step):
+            yield pdf_reader.pages[page_num].extract_text() or ""
+        for future in futures:
+            yield from future.result()
+    finally:
+        # A caller that stops early leaves the pool free for the next upload
+        for future in futures:
+            future.cancel()
+
+def _get_extraction_executor(workers):
+    """Get the shared extraction process pool with the given number of workers"""
+    with _extraction_executors_lock:
+        executor = _extraction_executors.get(workers)
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _extraction_executors[workers] = executor
+        return executor
+
+def _extract_page_range(pdf_bytes, start, stop):
+    """Extract raw text for pages [start, stop) in a worker process"""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [pdf_reader.pages[page_num].extract_text() or "" for page_num in range(start, stop)]
+
+def read_pdf_bytes(uploaded_file):
+    """
+    Read the raw bytes of an uploaded PDF without consuming the stream
+    
+    Args:
+        uploaded_file: Streamlit uploaded file object, file-like object or bytes
+    
+    Returns:
+        bytes: PDF file content
+    """
+    if isinstance(uploaded_file, (bytes, bytearray)):
+        return bytes(uploaded_file)
+    if hasattr(uploaded_file, 'getvalue'):
+        return uploaded_file.getvalue()
+    
+    position = uploaded_file.tell()
+    uploaded_file.seek(0)
+    data = uploaded_file.read()
+    uploaded_file.seek(position)
+    return data
+
+def pdf_content_hash(uploaded_file):
+    """
+    Hash the bytes of a PDF
+    
+    Keys the extraction cache, and the question pools and chunk coverage of
+    the document, so they do not depend on how much text was extracted yet.
+    
+    Args:
+        uploaded_file: Streamlit uploaded file object, file-like object or bytes
+    
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(read_pdf_bytes(uploaded_file)).hexdigest()
+
+def get_extraction_cache_stats():
+    """
+    Get hit/miss counters for the extraction cache in this process
+    
+    Returns:
+        dict: Hits, misses and hit rate
+    """
+    with _extraction_cache_stats_lock:
+        hits = _extraction_cache_stats['hits']
+        misses = _extraction_cache_stats['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': (hits / lookups) if lookups else 0.0
+    }
+
+def _count_extraction_cache_lookup(hit):
+    with _extraction_cache_stats_lock:
+        _extraction_cache_stats['hits' if hit else 'misses'] += 1
+
 def clean_extracted_text(text):
     """
     Clean and normalize extracted text from PDF
     
+    Every page break is kept as PAGE_BREAK, including those around pages
+    without text, so the page of any position is one more than the page
+    breaks before it. Blank lines become a paragraph break ("\\n\\n") and
+    every other whitespace run, including wrapped lines, collapses to a
+    single space. The text is split on page breaks and blank
+    lines and each paragraph is collapsed with str.split(), so the work is
+    done by C string methods rather than a per-match callback; see
+    text_cleaning_benchmark.py.
+    
     Args:
         text (str): Raw extracted text
-        
+    
     Returns:
         str: Cleaned text
     """
     if not text:
         return ""
     
-    # Remove excessive whitespace and normalize line breaks
-    import re
-    
-    # Replace multiple whitespace with single space
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Replace multiple newlines with single newline
-    text = re.sub(r'\n+', '\n', text)
-    
-    # Remove extra spaces around newlines
-    text = re.sub(r' *\n *', '\n', text)
-    
-    # Remove leading/trailing whitespace
-    text = text.strip()
-    
-    return text
+    pages = []
+    for page in text.split(PAGE_BREAK):
+        paragraphs = [' '.join(paragraph.split()) for paragraph in _BLANK_LINE_RE.split(page)]
+        pages.append('\n\n'.join(paragraph for paragraph in paragraphs if paragraph))
+    return PAGE_BREAK.join(pages)
 
 def validate_pdf_content(text, min_length=100):
     """
@@ -80,7 +322,7 @@ def validate_pdf_content(text, min_length=100):
     Args:
         text (str): Extracted text content
         min_length (int): Minimum required text length
-        
+    
     Returns:
         tuple: (is_valid, error_message)
     """
@@ -91,8 +333,7 @@ def validate_pdf_content(text, min_length=100):
         return False, f"PDF content is too short (minimum {min_length} characters required)."
     
     # Check if text contains meaningful content (not just special characters)
-    import re
-    meaningful_chars = re.sub(r'[^\w\s]', '', text)
+    meaningful_chars = _NON_WORD_RE.sub('', text)
     if len(meaningful_chars) < min_length * 0.7:  # At least 70% should be meaningful characters
         return False, "PDF content doesn't contain enough readable text."
     
@@ -104,7 +345,7 @@ def get_text_statistics(text):
     
     Args:
         text (str): Extracted text content
-        
+    
     Returns:
         dict: Statistics including word count, character count, etc.
     """
@@ -116,19 +357,17 @@ def get_text_statistics(text):
             'paragraphs': 0
         }
     
-    import re
-    
     # Count characters (excluding whitespace)
-    char_count = len(re.sub(r'\s', '', text))
+    char_count = len(_WHITESPACE_CHAR_RE.sub('', text))
     
     # Count words
     word_count = len(text.split())
     
     # Count sentences (rough estimation)
-    sentence_count = len(re.split(r'[.!?]+', text))
+    sentence_count = len(_SENTENCE_END_RE.split(text))
     
-    # Count paragraphs
-    paragraph_count = len([p for p in text.split('\n\n') if p.strip()])
+    # Count paragraphs (page breaks also end a paragraph)
+    paragraph_count = len([p for p in _PARAGRAPH_SPLIT_RE.split(text) if p.strip()])
     
     return {
         'characters': char_count,
@@ -0,0 +1,86 @@
+import json
+
+class QuestionStreamParser:
+    """
+    Incrementally extract question objects from streamed model output
+    
+    Text is fed in arbitrary pieces; every JSON object that sits directly
+    inside an array (the entries of "questions") is returned as soon as its
+    closing brace arrives. Markdown fences and any text around the JSON are
+    ignored, and a truncated tail only loses the question it cut off.
+    """
+    
+    def __init__(self):
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self._buffer = []
+    
+    def feed(self, text):
+        """
+        Consume the next piece of model output
+        
+        Args:
+            text (str): Newly received text
+        
+        Returns:
+            list: Question dictionaries completed by this piece
+        """
+        completed = []
+        for char in text:
+            if self._object_start is not None:
+                self._buffer.append(char)
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            
+            if char == '"':
+                self._in_string = True
+            elif char == '{':
+                # An object opening directly inside an array is a question entry
+                if self._object_start is None and self._stack and self._stack[-1] == '[':
+                    self._object_start = len(self._stack)
+                    self._buffer = ['{']
+                self._stack.append('{')
+            elif char == '[':
+                self._stack.append('[')
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if char == '}' and self._object_start is not None and len(self._stack) == self._object_start:
+                    question = self._decode(''.join(self._buffer))
+                    if question is not None:
+                        completed.append(question)
+                    self._object_start = None
+                    self._buffer = []
+        
+        return completed
+    
+    @staticmethod
+    def _decode(object_text):
+        try:
+            value = json.loads(object_text)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(value, dict) and 'question' in value:
+            return value
+        return None
+
+def parse_partial_questions(response_text):
+    """
+    Extract every complete question object from a possibly truncated response
+    
+    Args:
+        response_text (str): Raw model response
+    
+    Returns:
+        list: Question dictionaries in response order
+    """
+    return QuestionStreamParser().feed(response_text)
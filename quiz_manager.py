@@ -1,26 +1,194 @@
+import json
+import uuid
+import zlib
+from array import array
+from dataclasses import dataclass
+
+# Version of the serialize() format, checked by restore()
+QUIZ_STATE_VERSION = 1
+
+@dataclass(slots=True)
+class QuizQuestion:
+    """
+    One multiple-choice question as held by a running quiz
+    
+    The correct answer is kept as an index into options, so no answer
+    string is stored twice.
+    """
+    question: str
+    options: tuple
+    correct_index: int
+    explanation: str = ''
+    
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a question from an MCQ dictionary
+        
+        Args:
+            data (dict): MCQ dictionary with question, options, correct_answer and explanation
+        
+        Returns:
+            QuizQuestion: Compact question record
+        """
+        options = tuple(data['options'])
+        correct_answer = data.get('correct_answer')
+        correct_index = options.index(correct_answer) if correct_answer in options else -1
+        return cls(data['question'], options, correct_index, data.get('explanation', '') or '')
+    
+    @property
+    def correct_answer(self):
+        """Text of the correct option"""
+        return self.options[self.correct_index] if self.correct_index >= 0 else ''
+    
+    def to_dict(self):
+        """
+        Convert back to an MCQ dictionary
+        
+        Returns:
+            dict: MCQ dictionary as produced by the generator
+        """
+        return {
+            'question': self.question,
+            'options': list(self.options),
+            'correct_answer': self.correct_answer,
+            'explanation': self.explanation
+        }
+
 class QuizManager:
     """
     Manages the quiz state, progress, and scoring
+    
+    Questions are QuizQuestion records and answers are option indices in a
+    byte array, which keeps the many instances held in Streamlit session
+    state small. Each answer is scored once when it is submitted: the
+    correct count and a per-question correctness bitmap are kept up to
+    date, so results never rescan the answers.
     """
     
-    def __init__(self, questions):
+    __slots__ = (
+        'questions', 'attempt_id', 'expected_count', 'loading',
+        'current_question_index', 'answer_indices', 'completed',
+        'correct_count', 'correct_bitmap'
+    )
+    
+    def __init__(self, questions, expected_count=None, loading=False):
         """
         Initialize quiz manager with questions
         
         Args:
             questions (list): List of MCQ dictionaries
+            expected_count (int): Number of questions the quiz will have once loaded
+            loading (bool): Whether more questions are still being generated
         """
-        self.questions = questions
+        self.questions = [QuizQuestion.from_dict(question) for question in questions]
+        # Identifies this attempt when saving, so reruns of the results page never save it twice
+        self.attempt_id = uuid.uuid4().hex
+        self.expected_count = expected_count or len(questions)
+        self.loading = loading
         self.current_question_index = 0
-        self.user_answers = []
+        self.answer_indices = array('b')
         self.completed = False
+        self.correct_count = 0
+        self.correct_bitmap = bytearray()
+    
+    @property
+    def user_answers(self):
+        """Selected option texts in question order"""
+        return [
+            self.questions[i].options[option_index] for i, option_index in enumerate(self.answer_indices)
+        ]
+    
+    def get_question_dicts(self):
+        """
+        Get the questions as MCQ dictionaries, e.g. for saving to the database
+        
+        Returns:
+            list: MCQ dictionaries in quiz order
+        """
+        return [question.to_dict() for question in self.questions]
+    
+    def add_question(self, question):
+        """
+        Append a question that finished generating after the quiz started
+        
+        Args:
+            question (dict): MCQ dictionary
+        """
+        self.questions.append(QuizQuestion.from_dict(question))
+    
+    def finish_loading(self):
+        """
+        Mark the question list as final
+        
+        The quiz is shortened to the questions that arrived and completes
+        if they have all been answered already.
+        """
+        self.loading = False
+        self.expected_count = len(self.questions)
+        if self.questions and self.current_question_index >= len(self.questions):
+            self.completed = True
+    
+    def serialize(self):
+        """
+        Pack the quiz state into compact bytes, e.g. to offload it to the database
+        
+        Returns:
+            bytes: zlib-compressed JSON state, read back with restore()
+        """
+        state = {
+            'version': QUIZ_STATE_VERSION,
+            'attempt_id': self.attempt_id,
+            'expected_count': self.expected_count,
+            'loading': self.loading,
+            'current_question_index': self.current_question_index,
+            'completed': self.completed,
+            'questions': [
+                [question.question, question.options, question.correct_index, question.explanation]
+                for question in self.questions
+            ],
+            'answers': self.answer_indices.tolist()
+        }
+        return zlib.compress(json.dumps(state, separators=(',', ':')).encode('utf-8'))
+    
+    @classmethod
+    def restore(cls, data):
+        """
+        Rebuild a quiz from serialize() output
+        
+        Args:
+            data (bytes): Serialized quiz state
+        
+        Returns:
+            QuizManager: Quiz in the saved state, with the same attempt_id
+        """
+        try:
+            state = json.loads(zlib.decompress(data).decode('utf-8'))
+        except (zlib.error, ValueError) as e:
+            raise Exception(f"Invalid quiz state: {str(e)}")
+        if state.get('version') != QUIZ_STATE_VERSION:
+            raise Exception(f"Unsupported quiz state version: {state.get('version')}")
+        
+        quiz_manager = cls([])
+        quiz_manager.questions = [
+            QuizQuestion(text, tuple(options), correct_index, explanation)
+            for text, options, correct_index, explanation in state['questions']
+        ]
+        quiz_manager.attempt_id = state['attempt_id']
+        quiz_manager.expected_count = state['expected_count']
+        quiz_manager.loading = state['loading']
+        quiz_manager.current_question_index = state['current_question_index']
+        quiz_manager.completed = state['completed']
+        for i, option_index in enumerate(state['answers']):
+            quiz_manager._record_answer(i, option_index)
+        return quiz_manager
     
     def get_current_question(self):
         """
         Get the current question
         
         Returns:
-            dict: Current question data
+            QuizQuestion: Current question data
         """
         if self.current_question_index < len(self.questions):
             return self.questions[self.current_question_index]
@@ -31,16 +199,50 @@ class QuizManager:
         Submit answer for current question and move to next
         
         Args:
-            answer (str): Selected answer option
+            answer (str): Selected answer option, or its index
         """
         if self.current_question_index < len(self.questions):
-            self.user_answers.append(answer)
+            question = self.questions[self.current_question_index]
+            option_index = answer if isinstance(answer, int) else question.options.index(answer)
+            self._record_answer(self.current_question_index, option_index)
             self.current_question_index += 1
             
             # Check if quiz is completed
-            if self.current_question_index >= len(self.questions):
+            if self.current_question_index >= len(self.questions) and not self.loading:
                 self.completed = True
     
+    def _record_answer(self, question_index, option_index):
+        """Store an answer and update the score counters"""
+        self.answer_indices.append(option_index)
+        if option_index == self.questions[question_index].correct_index:
+            byte_index, bit = divmod(question_index, 8)
+            if byte_index >= len(self.correct_bitmap):
+                self.correct_bitmap.extend(bytes(byte_index - len(self.correct_bitmap) + 1))
+            self.correct_bitmap[byte_index] |= 1 << bit
+            self.correct_count += 1
+    
+    def is_answer_correct(self, index):
+        """
+        Check whether the answer to a question was correct
+        
+        Args:
+            index (int): Question index
+        
+        Returns:
+            bool: True if the question was answered correctly
+        """
+        byte_index, bit = divmod(index, 8)
+        return byte_index < len(self.correct_bitmap) and bool(self.correct_bitmap[byte_index] >> bit & 1)
+    
+    def get_correct_flags(self):
+        """
+        Get the correctness of every answer given so far
+        
+        Returns:
+            list: One bool per answered question, in quiz order
+        """
+        return [self.is_answer_correct(i) for i in range(len(self.answer_indices))]
+    
     def get_progress(self):
         """
         Get current progress information
@@ -48,10 +250,11 @@ class QuizManager:
         Returns:
             dict: Progress information
         """
+        total_questions = max(self.expected_count, len(self.questions))
         return {
             'current_question': self.current_question_index + 1,
-            'total_questions': len(self.questions),
-            'progress_percentage': (self.current_question_index / len(self.questions)) * 100,
+            'total_questions': total_questions,
+            'progress_percentage': (self.current_question_index / total_questions) * 100,
             'completed': self.completed
         }
     
@@ -66,7 +269,7 @@ class QuizManager:
     
     def get_score(self):
         """
-        Calculate and return the quiz score
+        Return the quiz score
         
         Returns:
             tuple: (correct_answers, total_questions)
@@ -74,14 +277,7 @@ class QuizManager:
         if not self.completed:
             return 0, len(self.questions)
         
-        correct_count = 0
-        for i, user_answer in enumerate(self.user_answers):
-            if i < len(self.questions):
-                correct_answer = self.questions[i]['correct_answer']
-                if user_answer == correct_answer:
-                    correct_count += 1
-        
-        return correct_count, len(self.questions)
+        return self.correct_count, len(self.questions)
     
     def get_detailed_results(self):
         """
@@ -93,19 +289,17 @@ class QuizManager:
         results = []
         
         for i, question in enumerate(self.questions):
-            if i < len(self.user_answers):
-                user_answer = self.user_answers[i]
-                correct_answer = question['correct_answer']
-                is_correct = user_answer == correct_answer
+            if i < len(self.answer_indices):
+                option_index = self.answer_indices[i]
                 
                 result = {
                     'question_number': i + 1,
-                    'question': question['question'],
-                    'user_answer': user_answer,
-                    'correct_answer': correct_answer,
-                    'is_correct': is_correct,
-                    'explanation': question.get('explanation', ''),
-                    'options': question['options']
+                    'question': question.question,
+                    'user_answer': question.options[option_index],
+                    'correct_answer': question.correct_answer,
+                    'is_correct': self.is_answer_correct(i),
+                    'explanation': question.explanation,
+                    'options': list(question.options)
                 }
                 
                 results.append(result)
@@ -117,8 +311,10 @@ class QuizManager:
         Reset the quiz to start over
         """
         self.current_question_index = 0
-        self.user_answers = []
+        self.answer_indices = array('b')
         self.completed = False
+        self.correct_count = 0
+        self.correct_bitmap = bytearray()
     
     def get_question_by_index(self, index):
         """
@@ -126,9 +322,9 @@ class QuizManager:
         
         Args:
             index (int): Question index
-            
+        
         Returns:
-            dict: Question data or None if index is invalid
+            QuizQuestion: Question data or None if index is invalid
         """
         if 0 <= index < len(self.questions):
             return self.questions[index]
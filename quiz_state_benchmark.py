@@ -0,0 +1,121 @@
+"""
+Measure the memory held by many simultaneous quiz sessions
+
+Builds one answered quiz per simulated session and compares the traced
+memory and stored size of QuizManager with the plain dict state it
+replaced: the generator's question dicts plus a list of answer strings.
+
+Usage:
+    python quiz_state_benchmark.py [--sessions N] [--questions N] [--sample N]
+"""
+import argparse
+import pickle
+import tracemalloc
+import uuid
+
+from quiz_manager import QuizManager
+
+def build_questions(session, question_count):
+    """
+    Build MCQ dictionaries shaped like the generator's output
+    
+    Args:
+        session (int): Session number, makes every session's text distinct
+        question_count (int): Questions in the quiz
+    
+    Returns:
+        list: MCQ dictionaries
+    """
+    questions = []
+    for i in range(question_count):
+        options = [f"{letter}) Option {letter} for question {i} of session {session}, about one sentence long"
+                   for letter in "ABCD"]
+        questions.append({
+            'question': f"Session {session}, question {i}: what does the passage say about this topic?",
+            'options': options,
+            'correct_answer': options[i % 4],
+            'explanation': f"Session {session} explanation {i}: the passage gives this as the reason in its "
+                           f"discussion of topic {i}, while options {'ABCD'[(i + 1) % 4]} and "
+                           f"{'ABCD'[(i + 2) % 4]} describe details it mentions in other contexts."
+        })
+    return questions
+
+def dict_quiz_state(questions):
+    """The per-session state QuizManager held before it used compact records"""
+    return {
+        'questions': questions,
+        'attempt_id': uuid.uuid4().hex,
+        'expected_count': len(questions),
+        'loading': False,
+        'current_question_index': 0,
+        'user_answers': [],
+        'completed': False
+    }
+
+def answer_dict_quiz(state, session):
+    """Answer every question of a dict state"""
+    for question in state['questions']:
+        state['user_answers'].append(question['options'][session % 4])
+        state['current_question_index'] += 1
+    state['completed'] = True
+
+def answer_quiz_manager(quiz_manager, session):
+    """Answer every question of a QuizManager"""
+    for question in quiz_manager.questions:
+        quiz_manager.submit_answer(question.options[session % 4])
+
+def measure(build_session, session_count):
+    """
+    Build sessions and measure the memory they keep alive
+    
+    Args:
+        build_session (callable): Builds the state of one session from its number
+        session_count (int): Sessions to build
+    
+    Returns:
+        tuple: (traced bytes, list of session states)
+    """
+    tracemalloc.start()
+    sessions = [build_session(session) for session in range(session_count)]
+    traced_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return traced_bytes, sessions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quiz session state memory")
+    parser.add_argument('--sessions', type=int, default=10000, help="Simultaneous sessions to build")
+    parser.add_argument('--questions', type=int, default=10, help="Questions per quiz")
+    parser.add_argument('--sample', type=int, default=1000, help="Sessions whose stored size is averaged")
+    args = parser.parse_args()
+    
+    def build_dict_session(session):
+        state = dict_quiz_state(build_questions(session, args.questions))
+        answer_dict_quiz(state, session)
+        return state
+    
+    def build_compact_session(session):
+        quiz_manager = QuizManager(build_questions(session, args.questions))
+        answer_quiz_manager(quiz_manager, session)
+        return quiz_manager
+    
+    dict_bytes, dict_sessions = measure(build_dict_session, args.sessions)
+    dict_stored = sum(len(pickle.dumps(state)) for state in dict_sessions[:args.sample])
+    del dict_sessions
+    
+    compact_bytes, compact_sessions = measure(build_compact_session, args.sessions)
+    compact_stored = sum(len(quiz_manager.serialize()) for quiz_manager in compact_sessions[:args.sample])
+    
+    restored = QuizManager.restore(compact_sessions[0].serialize())
+    if restored.get_detailed_results() != compact_sessions[0].get_detailed_results():
+        raise Exception("Restored quiz state differs from the original")
+    
+    sample = min(args.sample, args.sessions)
+    print(f"{args.sessions} sessions of {args.questions} answered questions")
+    print(f"{'state':<22} {'memory MB':>10} {'KB/session':>11} {'stored bytes':>13}")
+    for name, traced_bytes, stored in [('dict (pickled)', dict_bytes, dict_stored),
+                                       ('QuizManager.serialize', compact_bytes, compact_stored)]:
+        print(f"{name:<22} {traced_bytes / 1024 / 1024:>10.1f} {traced_bytes / args.sessions / 1024:>11.2f} "
+              f"{stored / sample:>13.0f}")
+
+if __name__ == "__main__":
+    main()
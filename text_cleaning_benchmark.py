@@ -0,0 +1,85 @@
+"""
+Compare clean_extracted_text with the regex chain it replaced
+
+Generates whitespace-heavy text resembling PyPDF2 output (wrapped lines,
+blank lines, tabs, CRLF and page breaks) and reports the best of several
+runs for each normalizer.
+
+Usage:
+    python text_cleaning_benchmark.py [--megabytes N] [--repeat N]
+"""
+import argparse
+import random
+import re
+import time
+
+from pdf_processor import clean_extracted_text, PAGE_BREAK
+
+_SEPARATORS = [' '] * 6 + ['  ', '\n', ' \n ', '\t', '\r\n', '\n\n', '   \n\n  ', f' {PAGE_BREAK} ']
+
+def build_sample_text(megabytes, seed=11):
+    """
+    Build random words joined by a mix of whitespace runs
+    
+    Args:
+        megabytes (float): Approximate size of the text
+        seed (int): Seed for the generated text
+    
+    Returns:
+        str: Sample text
+    """
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('abcdefghijklmnop') for _ in range(rng.randint(2, 9))) for _ in range(500)]
+    parts = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        word = rng.choice(words)
+        separator = rng.choice(_SEPARATORS)
+        parts.append(word)
+        parts.append(separator)
+        size += len(word) + len(separator)
+    return ''.join(parts)
+
+def baseline_clean(text):
+    """The regex chain clean_extracted_text used before paragraphs and page breaks were kept"""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\n+', '\n', text)
+    text = re.sub(r' *\n *', '\n', text)
+    return text.strip()
+
+def time_normalizer(normalizer, text, repeat):
+    """
+    Time a normalizer on a text
+    
+    Args:
+        normalizer (callable): Function taking and returning text
+        text (str): Input text
+        repeat (int): Runs to take the best time of
+    
+    Returns:
+        float: Best time in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        normalizer(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extracted text normalization")
+    parser.add_argument('--megabytes', type=float, default=1.3, help="Size of the generated text")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per normalizer, best time is reported")
+    args = parser.parse_args()
+    
+    text = build_sample_text(args.megabytes)
+    print(f"{len(text) / 1024 / 1024:.1f} MB of text")
+    
+    baseline = time_normalizer(baseline_clean, text, args.repeat)
+    current = time_normalizer(clean_extracted_text, text, args.repeat)
+    print(f"{'regex chain (before)':<24} {baseline:.3f}s")
+    print(f"{'clean_extracted_text':<24} {current:.3f}s  ({baseline / current:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import re
+import math
+import heapq
+from bisect import bisect_right
+from collections import Counter
+
+from pdf_processor import PAGE_BREAK
+
+# A sentence runs up to terminal punctuation or a paragraph/page break
+_SENTENCE_RE = re.compile(r'[^.!?\n\f]+[.!?]*')
+_TOKEN_RE = re.compile(r'\w+')
+
+# Query words shorter than this are ignored when looking up hints
+MIN_QUERY_WORD_LENGTH = 4
+
+# BM25 parameters: term frequency saturation and sentence length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Question phrasing words that say nothing about the topic
+_QUESTION_STOPWORDS = frozenset([
+    'about', 'according', 'after', 'also', 'based', 'been', 'being', 'best',
+    'could', 'does', 'following', 'from', 'have', 'into', 'most', 'only',
+    'should', 'statement', 'text', 'than', 'that', 'their', 'them', 'then',
+    'there', 'these', 'they', 'this', 'those', 'true', 'what', 'when', 'where',
+    'which', 'while', 'will', 'with', 'would'
+])
+
+def tokenize(text):
+    """
+    Split text into lowercase word tokens
+    
+    Args:
+        text (str): Text to tokenize
+    
+    Returns:
+        list: Lowercase tokens
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+class DocumentIndex:
+    """
+    Sentence index over extracted PDF text, built once per document
+    
+    Keeps sentence offsets into the original text, the page each sentence
+    starts on and an inverted index from token to the ids of the sentences
+    containing it, so lookups never rescan the document. BM25 weights for
+    every posting are computed up front, so ranking a query only sums the
+    weights of its terms.
+    """
+    
+    def __init__(self, text):
+        """
+        Build the index for a document
+        
+        Args:
+            text (str): Cleaned text from pdf_processor
+        """
+        self.text = text
+        self.sentence_offsets = []
+        self.sentence_pages = []
+        self.postings = {}
+        self.posting_weights = {}
+        
+        # The text keeps one PAGE_BREAK per page break, including around pages without text
+        page_starts = [match.end() for match in re.finditer(re.escape(PAGE_BREAK), text)]
+        sentence_lengths = []
+        posting_counts = {}
+        
+        for match in _SENTENCE_RE.finditer(text):
+            sentence = match.group().strip()
+            if not sentence:
+                continue
+            
+            sentence_id = len(self.sentence_offsets)
+            self.sentence_offsets.append((match.start(), match.end()))
+            self.sentence_pages.append(bisect_right(page_starts, match.start()) + 1)
+            
+            tokens = tokenize(sentence)
+            sentence_lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                self.postings.setdefault(token, []).append(sentence_id)
+                posting_counts.setdefault(token, []).append(count)
+        
+        self._compute_bm25_weights(sentence_lengths, posting_counts)
+    
+    def _compute_bm25_weights(self, sentence_lengths, posting_counts):
+        """Precompute the BM25 contribution of each term to each sentence containing it"""
+        sentence_count = len(sentence_lengths)
+        if not sentence_count:
+            return
+        
+        average_length = sum(sentence_lengths) / sentence_count or 1
+        length_norms = [
+            BM25_K1 * (1 - BM25_B + BM25_B * length / average_length) for length in sentence_lengths
+        ]
+        
+        for token, sentence_ids in self.postings.items():
+            idf = math.log(1 + (sentence_count - len(sentence_ids) + 0.5) / (len(sentence_ids) + 0.5))
+            self.posting_weights[token] = [
+                idf * count * (BM25_K1 + 1) / (count + length_norms[sentence_id])
+                for sentence_id, count in zip(sentence_ids, posting_counts[token])
+            ]
+    
+    def __len__(self):
+        return len(self.sentence_offsets)
+    
+    def get_sentence(self, sentence_id):
+        """
+        Get the text of a sentence
+        
+        Args:
+            sentence_id (int): Sentence position in the document
+        
+        Returns:
+            str: Sentence text
+        """
+        start, end = self.sentence_offsets[sentence_id]
+        return self.text[start:end].strip()
+    
+    def get_page(self, sentence_id):
+        """
+        Get the 1-based page number a sentence starts on
+        
+        Args:
+            sentence_id (int): Sentence position in the document
+        
+        Returns:
+            int: Page number
+        """
+        return self.sentence_pages[sentence_id]
+    
+    def rank_sentences(self, query, limit=3):
+        """
+        Rank sentences against a query with BM25
+        
+        Args:
+            query (str): Question or search text
+            limit (int): Maximum number of sentence ids to return
+        
+        Returns:
+            list: Sentence ids, most relevant first
+        """
+        terms = {
+            token for token in tokenize(query)
+            if len(token) >= MIN_QUERY_WORD_LENGTH and token not in _QUESTION_STOPWORDS
+        }
+        
+        scores = {}
+        for term in terms:
+            if term not in self.postings:
+                continue
+            for sentence_id, weight in zip(self.postings[term], self.posting_weights[term]):
+                scores[sentence_id] = scores.get(sentence_id, 0.0) + weight
+        
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [sentence_id for sentence_id, _ in top]